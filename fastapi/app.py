@@ -1,15 +1,29 @@
+import logging
+import os
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 from database import connect_db, disconnect_db, init_db
+from cache import warm_catalogue_cache
+from compression import CompressionMiddleware, compression_budget
+from invalidation import invalidation_listener
+from recents_buffer import recents_buffer
+from queries.books import load_suggest_index
+from scan_jobs import cancel_scan_jobs
+from watcher import BOOKS_WATCH_ENABLED, books_watcher
+from thumbnails import THUMBNAIL_CACHE_DIR, ThumbnailFiles
 from routes.books import router as books_router
 from routes.users import router as users_router
 from routes.recents import router as recents_router
 from routes.favourites import router as favourites_router
 from routes.notes import router as notes_router
+from routes.stats import router as stats_router
 
 app = FastAPI()
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("APP")
 
 # For development purposes
 origins = ["*"]
@@ -22,22 +36,40 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all HTTP methods
     allow_headers=["*"],  # Allows all headers
 )
+app.add_middleware(CompressionMiddleware)
 app.mount("/images_static", StaticFiles(directory="/images"), name="images")
 app.mount("/books_static", StaticFiles(directory="/books"), name="books")
+os.makedirs(THUMBNAIL_CACHE_DIR, exist_ok=True)
+app.mount(
+    "/thumbnails", ThumbnailFiles(directory=THUMBNAIL_CACHE_DIR), name="thumbnails"
+)
 
 app.include_router(books_router)
 app.include_router(users_router)
 app.include_router(recents_router)
 app.include_router(favourites_router)
 app.include_router(notes_router)
+app.include_router(stats_router)
 
 
 @app.on_event("startup")
 async def startup():
     await connect_db()
     await init_db()
+    await load_suggest_index()
+    await invalidation_listener.start()
+    await recents_buffer.start()
+    await warm_catalogue_cache()
+    if BOOKS_WATCH_ENABLED:
+        await books_watcher.start()
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    if BOOKS_WATCH_ENABLED:
+        await books_watcher.stop()
+    await cancel_scan_jobs()
+    await recents_buffer.stop()
+    await invalidation_listener.stop()
+    logger.info(f"Compression: {compression_budget.stats()}")
     await disconnect_db()
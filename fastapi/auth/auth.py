@@ -1,7 +1,16 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import hmac
 import logging
+import os
+import time
 
-from fastapi import Depends, HTTPException
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -10,8 +19,30 @@ SECRET_KEY = "kmitl_rai7"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# Verified tokens, keyed by SHA-256 of the token: digest -> (sub, expires_at).
+# Only successful decodes are cached, and never past the token's exp.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 300))
+# Lifetime of signed file URLs (seconds)
+FILE_URL_TTL = int(os.getenv("FILE_URL_TTL", 300))
+_token_cache: "OrderedDict[bytes, tuple[str, int]]" = OrderedDict()
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/signin")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/signin", auto_error=False)
+# Raising BCRYPT_ROUNDS upgrades stored hashes transparently on next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+)
+
+# bcrypt runs in its own small pool so logins never block the event loop;
+# beyond PASSWORD_QUEUE_LIMIT queued/running jobs requests get a 503
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", 2))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", 32))
+_password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt"
+)
+_password_jobs = 0
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(" AUTH ")
@@ -25,6 +56,37 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def _run_password_job(func, *args):
+    global _password_jobs
+    if _password_jobs >= PASSWORD_QUEUE_LIMIT:
+        logger.warning("Password hashing queue is full")
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    _password_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_jobs -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_password_job(hash_password, password)
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    # Returns (valid, new_hash); new_hash is set when the stored hash uses
+    # outdated settings (e.g. fewer rounds) and should be replaced
+    return await _run_password_job(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+
 def create_access_token(data: dict, remember_me: bool = False):
     to_encode = data.copy()
     if remember_me:
@@ -38,14 +100,71 @@ def create_access_token(data: dict, remember_me: bool = False):
     return encoded_jwt
 
 
+def _cache_verified_token(key: bytes, user_id: str, exp) -> None:
+    # Keep the entry no longer than the token itself is valid
+    expires_at = int(time.time()) + TOKEN_CACHE_TTL
+    if exp is not None:
+        expires_at = min(expires_at, int(exp))
+    _token_cache[key] = (user_id, expires_at)
+    _token_cache.move_to_end(key)
+    if len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    key = hashlib.sha256(token.encode()).digest()
+    cached = _token_cache.get(key)
+    if cached is not None:
+        user_id, expires_at = cached
+        # Same rule as jose's exp check: valid while now <= exp
+        if int(time.time()) <= expires_at:
+            _token_cache.move_to_end(key)
+            return user_id
+        del _token_cache[key]
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         if user_id is None:
             logger.info("Token does not contain 'sub' claim")
             raise HTTPException(status_code=401, detail="Invalid token")
+        _cache_verified_token(key, user_id, payload.get("exp"))
         return user_id
     except JWTError as e:
         logger.info(f"JWTError: {str(e)}")
         raise HTTPException(status_code=401, detail="Invalid token")
+
+
+# For URLs opened directly by the browser (e.g. a PDF viewer), which cannot
+# attach an Authorization header. Rather than putting the long-lived token in
+# the query string (and so in logs and history), such URLs carry a short-lived
+# HMAC signature that grants one user access to one book's file.
+def _file_signature(book_id: int, user_id: str, expires: int) -> str:
+    message = f"{book_id}:{user_id}:{expires}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def sign_file_access(book_id: int, user_id: str) -> dict:
+    expires = int(time.time()) + FILE_URL_TTL
+    return {
+        "user": user_id,
+        "expires": expires,
+        "signature": _file_signature(book_id, user_id, expires),
+    }
+
+
+async def get_current_user_or_signed_url(
+    book_id: int,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    user: Optional[str] = Query(None),
+    expires: Optional[int] = Query(None),
+    signature: Optional[str] = Query(None),
+):
+    if token:
+        return await get_current_user(token)
+    if user is None or expires is None or signature is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    expected = _file_signature(book_id, user, expires)
+    if expires < int(time.time()) or not hmac.compare_digest(signature, expected):
+        logger.info(f"Rejected file URL signature for book {book_id}")
+        raise HTTPException(status_code=401, detail="Invalid or expired file URL")
+    return user
@@ -0,0 +1,121 @@
+"""Memory and latency of the in-process suggest index over a synthetic
+catalogue: build, lookups, single-book updates and a background merge.
+
+Usage (from the fastapi directory):
+    python -m benchmarks.bench_autocomplete [--books 100000] [--lookups 20000]
+"""
+
+import argparse
+import asyncio
+import gc
+from itertools import accumulate
+import random
+import statistics
+import time
+import tracemalloc
+
+from autocomplete import SUGGEST_COMPACT_AT, PrefixIndex
+
+# Titles of ~6 words and authors of 2, drawn from a Zipf-ish vocabulary so
+# words repeat the way they do in a real catalogue
+VOCABULARY = 20000
+
+
+def make_words(rng: random.Random) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return [
+        "".join(rng.choices(letters, k=rng.randint(3, 10))) for _ in range(VOCABULARY)
+    ]
+
+
+def make_rows(count: int, seed: int = 1) -> list[tuple[int, str, str]]:
+    rng = random.Random(seed)
+    words = make_words(rng)
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(VOCABULARY)))
+    rows = []
+    for book_id in range(1, count + 1):
+        title = " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(3, 9))).title()
+        author = " ".join(rng.choices(words, k=2)).title()
+        rows.append((book_id, title, author))
+    return rows
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.books)
+    started = time.perf_counter()
+    PrefixIndex().build(rows)
+    build_s = time.perf_counter() - started
+
+    # Measured on a second build (tracing makes building much slower). The
+    # rows are made under tracing too, so the title and author strings the
+    # index keeps are counted; the row list and tuples are freed before reading
+    del rows
+    gc.collect()
+    tracemalloc.start()
+    rows = make_rows(args.books)
+    index = PrefixIndex()
+    index.build(rows)
+    del rows
+    gc.collect()
+    memory_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    print(f"{args.books} books, {len(index._keys)} keys")
+    print(f"build:            {build_s:8.2f} s")
+    print(f"index memory:     {memory_mb:8.1f} MB")
+
+    rng = random.Random(2)
+    keys = rng.choices(index._keys, k=args.lookups)
+    prefixes = [key[: rng.randint(1, 6)] for key in keys]
+    samples = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        index.suggest(prefix, 10)
+        samples.append((time.perf_counter() - started) * 1e6)
+    print(f"lookup:           {statistics.median(samples):8.1f} us median")
+    print(f"                  {percentile(samples, 0.99):8.1f} us p99")
+
+    updates = make_rows(1000, seed=3)
+    samples = []
+    for book_id, title, author in updates:
+        started = time.perf_counter()
+        index.update([(rng.randint(1, args.books), title, author)])
+        samples.append((time.perf_counter() - started) * 1e6)
+    print(f"single update:    {statistics.median(samples):8.1f} us median")
+    print(f"                  {percentile(samples, 0.99):8.1f} us p99")
+
+    extra = [
+        (args.books + book_id, title, author)
+        for book_id, title, author in make_rows(SUGGEST_COMPACT_AT // 8, seed=4)
+    ]
+    stalls = []
+
+    async def ticker() -> None:
+        # Longest gap between 1 ms sleeps: how long the loop was held up
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - started - 0.001)
+
+    ticking = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    index.update(extra)  # crosses SUGGEST_COMPACT_AT: merges in the background
+    if index._compacting is not None:
+        await index._compacting
+    merge_s = time.perf_counter() - started
+    ticking.cancel()
+    print(f"batch + merge:    {merge_s:8.2f} s for {len(extra)} books")
+    print(f"loop stall:       {max(stalls) * 1000:8.1f} ms max")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""Per-file cost of the fast metadata path vs full PdfReader parsing.
+
+Usage (from the fastapi directory):
+    python -m benchmarks.bench_pdf_metadata [--files 20] [--pages 500] [--payload-mb 20]
+
+Generates a corpus of PDFs with many pages and a large embedded payload (to
+stand in for scanned images), then times both readers over it.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from pypdf import PdfWriter
+
+from pdf_metadata import read_pdf_metadata_fast, read_pdf_metadata_full
+
+
+def make_corpus(folder: Path, files: int, pages: int, payload_mb: int) -> list[Path]:
+    payload = os.urandom(payload_mb * 1024 * 1024)
+    paths = []
+    for i in range(files):
+        writer = PdfWriter()
+        for _ in range(pages):
+            writer.add_blank_page(width=612, height=792)
+        writer.add_metadata(
+            {"/Title": f"Book {i}", "/Author": "Bench", "/CreationDate": "D:20240101"}
+        )
+        writer.add_attachment("scan.bin", payload)
+        path = folder / f"book_{i}.pdf"
+        with open(path, "wb") as fh:
+            writer.write(fh)
+        paths.append(path)
+    return paths
+
+
+def time_reader(reader, paths: list[Path]) -> list[float]:
+    timings = []
+    for path in paths:
+        started = time.perf_counter()
+        reader(path)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--payload-mb", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_corpus(Path(tmp), args.files, args.pages, args.payload_mb)
+        assert read_pdf_metadata_fast(paths[0])["Pages"] == args.pages
+        for name, reader in (
+            ("full PdfReader", read_pdf_metadata_full),
+            ("fast path", read_pdf_metadata_fast),
+        ):
+            timings = time_reader(reader, paths)
+            print(
+                f"{name:>15}: median {statistics.median(timings):8.2f} ms/file, "
+                f"max {max(timings):8.2f} ms/file"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Cost of serializing a book list: per-row models plus response_model
+revalidation versus records straight to orjson bytes.
+
+Usage (from the fastapi directory):
+    python -m benchmarks.bench_serialization [--rows 50000] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import time
+
+from databases.backends.common.records import Record
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from models.books import BookListItem, BookListResponse
+from serialization import dump_json, model_fields, record_dicts
+
+
+def make_rows(count: int) -> list[Record]:
+    # Text-query records as databases returns them (no column map)
+    return [
+        Record(
+            {
+                "id": i,
+                "title": f"Book title number {i}",
+                "author": f"Author {i % 997}",
+                "year": 1950 + i % 70,
+                "image_path": f"/thumbnails/{i % 256:02x}/{i:064x}_320.webp",
+            },
+            (),
+            None,
+            ({}, {}, {}),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+async def models_path(rows, field) -> bytes:
+    # format_book -> BookListItem -> BookListResponse -> response_model -> json
+    books = [
+        {
+            "id": row["id"],
+            "image_path": row["image_path"],
+            "title": row["title"],
+            "author": row["author"],
+        }
+        for row in rows
+    ]
+    response = BookListResponse(books=[BookListItem(**book) for book in books])
+    content = await serialize_response(field=field, response_content=response)
+    return JSONResponse(content).body
+
+
+async def fast_path(rows, fields) -> bytes:
+    return dump_json({"books": record_dicts(rows, fields), "next_cursor": None})
+
+
+async def best_of(repeat: int, func, *args) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = await func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, len(body)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    field = create_model_field("Response", BookListResponse)
+    slow_ms, slow_size = await best_of(args.repeat, models_path, rows, field)
+    fast_ms, fast_size = await best_of(
+        args.repeat, fast_path, rows, model_fields(BookListItem)
+    )
+    print(f"{args.rows} rows")
+    print(f"models + response_model: {slow_ms:8.1f} ms  ({slow_size} bytes)")
+    print(f"records -> orjson:       {fast_ms:8.1f} ms  ({fast_size} bytes)")
+    print(f"speed-up:                {slow_ms / fast_ms:8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
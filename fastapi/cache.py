@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional
+
+from fastapi import Request, Response
+
+from compression import ENCODINGS, compress_body, encoded_etag, negotiate_encoding
+
+# -------------------
+# Catalogue response cache
+# -------------------
+# Serialized list responses keyed by their resolved query parameters and the
+# catalogue version. Every write to books bumps the version (and drops the
+# cached bodies), so a cached body is never older than the catalogue.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 512))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("CACHE")
+
+
+class CachedBody:
+    __slots__ = ("body", "etag", "variants")
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        # Strong validator derived from the exact bytes sent
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        # Compressed copies, made on first request for each encoding
+        self.variants: dict[str, bytes] = {}
+
+    async def encoded(self, encoding: Optional[str]) -> tuple[bytes, Optional[str]]:
+        if encoding is None:
+            return self.body, None
+        data = self.variants.get(encoding)
+        if data is None:
+            data = await compress_body(self.body, encoding, cached=True)
+            if data is None:
+                return self.body, None  # too small, or over the CPU budget
+            self.variants[encoding] = data
+        return data, encoding
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.version = 0
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[CachedBody]:
+        entry = self._entries.get((self.version, key))
+        if entry is not None:
+            self._entries.move_to_end((self.version, key))
+        return entry
+
+    def put(self, key: Hashable, body: bytes) -> CachedBody:
+        entry = CachedBody(body)
+        self._entries[(self.version, key)] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def bump(self) -> None:
+        self.version += 1
+        self._entries.clear()
+
+
+catalogue_cache = ResponseCache(RESPONSE_CACHE_SIZE)
+_warmers: list[Callable[[], Awaitable[None]]] = []
+
+
+def bump_catalogue_version() -> None:
+    catalogue_cache.bump()
+
+
+def etag_matches(request: Optional[Request], etag: str) -> bool:
+    if request is None:
+        return False
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Any encoding of the same body is still current
+    current = {etag} | {encoded_etag(etag, encoding) for encoding in ENCODINGS}
+    return "*" in tags or not current.isdisjoint(tags)
+
+
+async def cached_json_response(
+    request: Optional[Request],
+    key: Hashable,
+    build: Callable[[], Awaitable[bytes]],
+) -> Response:
+    """Serve the JSON bytes from `build()` through the catalogue cache, with
+    ETag/304 and stored br/gzip variants."""
+    entry = catalogue_cache.get(key)
+    if entry is None:
+        version = catalogue_cache.version
+        body = await build()
+        if catalogue_cache.version != version:
+            # A write landed while building; serve the result but don't cache it
+            entry = CachedBody(body)
+        else:
+            entry = catalogue_cache.put(key, body)
+
+    encoding = None
+    if request is not None:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {"Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request, entry.etag):
+        headers["ETag"] = encoded_etag(entry.etag, encoding) if encoding else entry.etag
+        return Response(status_code=304, headers=headers)
+    body, encoding = await entry.encoded(encoding)
+    if encoding:
+        headers["ETag"] = encoded_etag(entry.etag, encoding)
+        headers["Content-Encoding"] = encoding
+    else:
+        headers["ETag"] = entry.etag
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def register_warmer(warmer: Callable[[], Awaitable[None]]) -> None:
+    _warmers.append(warmer)
+
+
+async def warm_catalogue_cache() -> None:
+    # Pre-build the hottest responses (after startup and after each scan)
+    for warmer in _warmers:
+        try:
+            await warmer()
+        except Exception as e:
+            logger.warning(f"Cache warm-up failed: {e}")
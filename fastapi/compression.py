@@ -0,0 +1,181 @@
+import gzip
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+import anyio
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# -------------------
+# Response compression
+# -------------------
+# Brotli or gzip for JSON responses above a size threshold. Cached catalogue
+# bodies keep their compressed variants (see cache.py); everything else is
+# compressed per response by CompressionMiddleware. All compression draws on a
+# per-worker CPU budget; once it's spent, responses go out uncompressed.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))
+# Cached variants are compressed once per catalogue version, so squeeze harder
+CACHED_GZIP_LEVEL = int(os.getenv("CACHED_GZIP_LEVEL", 9))
+CACHED_BROTLI_QUALITY = int(os.getenv("CACHED_BROTLI_QUALITY", 9))
+# CPU-seconds of compression allowed per wall-clock second, and the burst size
+COMPRESSION_CPU_SHARE = float(os.getenv("COMPRESSION_CPU_SHARE", 0.25))
+COMPRESSION_CPU_BURST = float(os.getenv("COMPRESSION_CPU_BURST", 1.0))
+# Bodies larger than this are compressed off the event loop
+COMPRESSION_THREAD_SIZE = 256 * 1024
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+ENCODINGS = ("br", "gzip")  # server preference
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("COMPRESSION")
+
+
+class CompressionBudget:
+    """Token bucket of compression CPU time, refilled at COMPRESSION_CPU_SHARE."""
+
+    def __init__(self, share: float, burst: float) -> None:
+        self.share = share
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.cpu_seconds = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compressed = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.share)
+            self.updated = now
+            if self.tokens > 0:
+                return True
+            self.skipped += 1
+            return False
+
+    def charge(self, cpu_seconds: float, size_in: int, size_out: int) -> None:
+        with self._lock:
+            self.tokens -= cpu_seconds
+            self.cpu_seconds += cpu_seconds
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+            self.compressed += 1
+
+    def stats(self) -> dict:
+        return {
+            "compressed": self.compressed,
+            "skipped_over_budget": self.skipped,
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+
+
+compression_budget = CompressionBudget(COMPRESSION_CPU_SHARE, COMPRESSION_CPU_BURST)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    # Pick br or gzip from Accept-Encoding, honouring q=0
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    started = time.thread_time()
+    if encoding == "br":
+        quality = CACHED_BROTLI_QUALITY if cached else BROTLI_QUALITY
+        data = brotli.compress(body, mode=brotli.MODE_TEXT, quality=quality)
+    else:
+        level = CACHED_GZIP_LEVEL if cached else GZIP_LEVEL
+        data = gzip.compress(body, compresslevel=level, mtime=0)
+    compression_budget.charge(time.thread_time() - started, len(body), len(data))
+    return data
+
+
+async def compress_body(body: bytes, encoding: str, cached: bool = False) -> Optional[bytes]:
+    """Compressed body, or None when it's too small or the CPU budget is spent."""
+    if len(body) < COMPRESSION_MIN_SIZE or not compression_budget.available():
+        return None
+    if len(body) >= COMPRESSION_THREAD_SIZE:
+        return await anyio.to_thread.run_sync(compress, body, encoding, cached)
+    return compress(body, encoding, cached)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    # Each encoding is its own representation and needs its own strong validator
+    return f'{etag[:-1]}-{encoding}"'
+
+
+class CompressionMiddleware:
+    """Compress single-message JSON/text responses. Streamed bodies (file
+    delivery, page windows) and already-encoded responses pass through."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if "content-encoding" in headers or not content_type.startswith(
+                    COMPRESSIBLE_TYPES
+                ):
+                    await send(message)
+                else:
+                    start = message  # held until we see the body
+                return
+            if start is None:
+                await send(message)
+                return
+            held, start = start, None
+            body = message.get("body", b"")
+            data = None
+            if not message.get("more_body", False):
+                data = await compress_body(body, encoding)
+            headers = MutableHeaders(raw=held["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if data is not None:
+                headers["content-encoding"] = encoding
+                headers["content-length"] = str(len(data))
+                if "etag" in headers:
+                    headers["etag"] = encoded_etag(headers["etag"], encoding)
+                message = {**message, "body": data}
+            await send(held)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
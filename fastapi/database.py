@@ -1,7 +1,14 @@
 from typing import Any, Optional, List
+import asyncio
+import asyncpg
+from asyncpg.exceptions import UndefinedTableError
+from collections import deque
 from databases import Database
+from functools import lru_cache
 import logging
 import os
+import re
+import time
 
 # -------------------
 # Database connection
@@ -16,31 +23,246 @@ POSTGRES_PORT = os.getenv("POSTGRES_PORT", 5432)
 
 DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
-database = Database(DATABASE_URL)
+# Pool sizing is per worker: total connections = workers * max size
+POSTGRES_POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN_SIZE", 2))
+POSTGRES_POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", 10))
+# Seconds a request may wait for a free connection before failing
+POSTGRES_ACQUIRE_TIMEOUT = float(os.getenv("POSTGRES_ACQUIRE_TIMEOUT", 10.0))
+# Prepared statements kept per connection (asyncpg LRU)
+POSTGRES_STATEMENT_CACHE_SIZE = int(os.getenv("POSTGRES_STATEMENT_CACHE_SIZE", 256))
+# Idle connections are closed after this many seconds...
+POSTGRES_CONN_IDLE_LIFETIME = float(os.getenv("POSTGRES_CONN_IDLE_LIFETIME", 300.0))
+# ...and every connection is replaced after this many queries
+POSTGRES_CONN_MAX_QUERIES = int(os.getenv("POSTGRES_CONN_MAX_QUERIES", 50000))
+
+database = Database(
+    DATABASE_URL,
+    min_size=POSTGRES_POOL_MIN_SIZE,
+    max_size=POSTGRES_POOL_MAX_SIZE,
+    statement_cache_size=POSTGRES_STATEMENT_CACHE_SIZE,
+    max_inactive_connection_lifetime=POSTGRES_CONN_IDLE_LIFETIME,
+    max_queries=POSTGRES_CONN_MAX_QUERIES,
+)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("DATABASE")
 
 
+class InstrumentedPool:
+    """Wraps the asyncpg pool that `databases` creates, adding the acquire
+    timeout and checkout/wait/latency counters. Everything else is passed
+    through to the real pool."""
+
+    def __init__(self, pool) -> None:
+        self._pool = pool
+        self.in_use = 0
+        self.waiting = 0
+        self.acquires = 0
+        self.timeouts = 0
+        self.max_wait_ms = 0.0
+        self._waits_ms: deque[float] = deque(maxlen=1024)
+
+    async def acquire(self):
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            connection = await self._pool.acquire(timeout=POSTGRES_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+        wait_ms = (time.perf_counter() - started) * 1000
+        self._waits_ms.append(wait_ms)
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.acquires += 1
+        self.in_use += 1
+        return connection
+
+    async def release(self, connection) -> None:
+        self.in_use -= 1
+        await self._pool.release(connection)
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits_ms)
+
+        def percentile(fraction: float) -> float:
+            return round(waits[int(fraction * (len(waits) - 1))], 3) if waits else 0.0
+
+        return {
+            "size": self._pool.get_size(),
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "in_use": self.in_use,
+            "idle": self._pool.get_idle_size(),
+            "waiting": self.waiting,
+            "acquires": self.acquires,
+            "acquire_timeouts": self.timeouts,
+            "acquire_ms_p50": percentile(0.5),
+            "acquire_ms_p99": percentile(0.99),
+            "acquire_ms_max": round(self.max_wait_ms, 3),
+        }
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+
 async def connect_db() -> None:
     await database.connect()
-    logger.info("Database connected")
+    # databases 0.9.x (pinned in requirements.txt) keeps the asyncpg pool on
+    # its backend, which has no public hook; swap in the wrapper there, and
+    # run uninstrumented rather than break if a release moves it
+    pool = getattr(database._backend, "_pool", None)
+    if isinstance(pool, asyncpg.Pool):
+        database._backend._pool = InstrumentedPool(pool)
+    else:
+        logger.warning("Unknown databases backend layout; pool stats disabled")
+    logger.info(
+        f"Database connected (pool {POSTGRES_POOL_MIN_SIZE}-{POSTGRES_POOL_MAX_SIZE})"
+    )
 
 
 async def disconnect_db() -> None:
+    logger.info(f"Pool stats: {pool_stats()}")
     await database.disconnect()
     logger.info("Database disconnected")
 
 
+def pool_stats() -> dict:
+    pool = getattr(database._backend, "_pool", None)
+    return pool.stats() if isinstance(pool, InstrumentedPool) else {}
+
+
 # -------------------
-# Table creation
+# Prepared statements
 # -------------------
+# `databases` rebuilds every text query through SQLAlchemy on each call. Hot
+# read paths use these helpers instead: the `:name` -> `$n` rewrite is done
+# once per query text, and asyncpg runs it as a prepared statement cached on
+# the connection (POSTGRES_STATEMENT_CACHE_SIZE).
+#
+# They return asyncpg Records, not the `databases` Records of database.fetch_*:
+# read them by key (row["title"]), dict(row) or **row, which both types
+# support; asyncpg Records have no `_mapping` or attribute access.
+_PARAM_RE = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+
+@lru_cache(maxsize=512)
+def _positional(query: str) -> tuple[str, tuple[str, ...]]:
+    names: list[str] = []
+
+    def number(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return _PARAM_RE.sub(number, query), tuple(names)
+
+
+async def fetch_all_prepared(query: str, values: Optional[dict] = None) -> List[Any]:
+    sql, names = _positional(query)
+    args = [values[name] for name in names] if names else []
+    async with database.connection() as connection:
+        return await connection.raw_connection.fetch(sql, *args)
+
+
+async def fetch_one_prepared(query: str, values: Optional[dict] = None) -> Optional[Any]:
+    sql, names = _positional(query)
+    args = [values[name] for name in names] if names else []
+    async with database.connection() as connection:
+        return await connection.raw_connection.fetchrow(sql, *args)
+
+
+# -------------------
+# Schema bootstrap
+# -------------------
+# The schema is built by numbered steps recorded in schema_version. A worker
+# starting against an up-to-date database does one version check and nothing
+# else; otherwise the first worker applies the missing steps under an advisory
+# lock while the others wait for it and then find nothing left to do.
+SCHEMA_LOCK_ID = 7_350_201  # pg_advisory_lock key for schema changes
+SCHEMA_LOCK_POLL = 0.5  # seconds between attempts while another worker migrates
+
+
 async def init_db() -> None:
+    if await _schema_version() >= SCHEMA_STEPS[-1][0]:
+        logger.info("Database schema is up to date.")
+        return
+    # Session-level lock: hold one connection for the whole bootstrap
+    async with database.connection():
+        # Poll rather than block in pg_advisory_lock: a blocked waiter holds a
+        # snapshot, which CREATE INDEX CONCURRENTLY would wait on forever
+        while not await database.fetch_val(
+            query="SELECT pg_try_advisory_lock(:key)", values={"key": SCHEMA_LOCK_ID}
+        ):
+            await asyncio.sleep(SCHEMA_LOCK_POLL)
+        try:
+            await database.execute(
+                query="""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            current = await _schema_version()
+            for version, step in SCHEMA_STEPS:
+                if version <= current:
+                    continue
+                await step()
+                await database.execute(
+                    query="""
+                    INSERT INTO schema_version (version, name) VALUES (:version, :name)
+                    """,
+                    values={"version": version, "name": step.__name__.strip("_")},
+                )
+                logger.info(f"Schema step {version} ({step.__name__}) applied.")
+        finally:
+            await database.execute(
+                query="SELECT pg_advisory_unlock(:key)", values={"key": SCHEMA_LOCK_ID}
+            )
+    logger.info("Database initialized successfully.")
+
+
+async def _schema_version() -> int:
+    try:
+        version = await database.fetch_val(query="SELECT max(version) FROM schema_version")
+    except UndefinedTableError:
+        return 0
+    return version or 0
+
+
+async def _create_index_concurrently(name: str, target: str, unique: bool = False) -> None:
+    # A failed CONCURRENTLY build leaves an invalid index that IF NOT EXISTS
+    # would keep forever; drop it and build again
+    invalid = await database.fetch_one(
+        query="""
+        SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = :name AND NOT i.indisvalid
+        """,
+        values={"name": name},
+    )
+    if invalid:
+        await database.execute(query=f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    await database.execute(
+        query=f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {target}"
+    )
+
+
+# -------------------
+# Step 1: tables
+# -------------------
+async def _create_tables() -> None:
     await _create_books_table()
+    await _create_books_search_column()
     await _create_users_table()
     await _create_recents_table()
     await _create_favourites_table()
     await _create_notes_table()
-    logger.info("Database initialized successfully.")
+    await _create_book_files_table()
+    await _create_scan_jobs_table()
 
 
 async def _create_books_table() -> None:
@@ -59,6 +281,23 @@ async def _create_books_table() -> None:
     logger.info("Books table created (or already exists).")
 
 
+async def _create_books_search_column() -> None:
+    # Weighted tsvector (title A, author B) kept up to date by Postgres itself
+    queries = [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        """
+        ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(author, '')), 'B')
+        ) STORED
+        """,
+    ]
+    for query in queries:
+        await database.execute(query=query)
+    logger.info("Books search column created (or already exists).")
+
+
 async def _create_users_table() -> None:
     query = """
     CREATE TABLE IF NOT EXISTS users (
@@ -119,3 +358,197 @@ async def _create_notes_table() -> None:
     """
     await database.execute(query=query)
     logger.info("Notes table created (or already exists.)")
+
+
+async def _create_book_files_table() -> None:
+    # One fingerprint per ingested file; rescans only open files whose
+    # (size, mtime_ns, inode) changed. Rows go away with their book.
+    query = """
+    CREATE TABLE IF NOT EXISTS book_files (
+        path TEXT PRIMARY KEY,
+        folder TEXT NOT NULL,
+        size BIGINT NOT NULL,
+        mtime_ns BIGINT NOT NULL,
+        inode BIGINT NOT NULL,
+        book_id INT NOT NULL REFERENCES books(id) ON DELETE CASCADE
+    )
+    """
+    await database.execute(query=query)
+    logger.info("Book files table created (or already exists.)")
+
+
+async def _create_scan_jobs_table() -> None:
+    query = """
+    CREATE TABLE IF NOT EXISTS scan_jobs (
+        id SERIAL PRIMARY KEY,
+        folder TEXT NOT NULL,
+        status TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        processed INTEGER NOT NULL DEFAULT 0,
+        errors INTEGER NOT NULL DEFAULT 0,
+        result JSONB,
+        error TEXT,
+        started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        finished_at TIMESTAMP
+    )
+    """
+    await database.execute(query=query)
+    logger.info("Scan jobs table created (or already exists.)")
+
+
+# -------------------
+# Step 2: indexes (built CONCURRENTLY, so reads and writes carry on)
+# -------------------
+async def _create_indexes() -> None:
+    await _create_books_indexes()
+    await _create_books_search_indexes()
+    await _create_books_link_unique_index()
+    await _create_recents_indexes()
+    await _create_book_files_indexes()
+    await _create_scan_jobs_indexes()
+
+
+async def _create_books_indexes() -> None:
+    # Composite (sort key, id) indexes back keyset pagination of the catalogue
+    indexes = {
+        "books_title_id_idx": "books (title, id)",
+        "books_author_id_idx": "books (author, id)",
+        "books_year_id_idx": "books ((COALESCE(year, 0)), id)",
+    }
+    for name, target in indexes.items():
+        await _create_index_concurrently(name, target)
+    logger.info("Books indexes created (or already exist).")
+
+
+async def _create_books_search_indexes() -> None:
+    # Trigram indexes so fuzzy and '%substring%' matches avoid seq scans
+    indexes = {
+        "books_search_vector_idx": "books USING GIN (search_vector)",
+        "books_title_trgm_idx": "books USING GIN (title gin_trgm_ops)",
+        "books_author_trgm_idx": "books USING GIN (author gin_trgm_ops)",
+    }
+    for name, target in indexes.items():
+        await _create_index_concurrently(name, target)
+    logger.info("Books search indexes created (or already exist).")
+
+
+async def _create_books_link_unique_index() -> None:
+    exists = await database.fetch_one(
+        query="""
+        SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = 'books_book_link_key' AND i.indisvalid
+        """
+    )
+    if exists:
+        return
+    # Older scans could insert the same file twice; keep the first copy, moving
+    # the duplicates' favourites, recents, notes and file rows onto it first so
+    # the delete doesn't cascade them away
+    duplicates = """
+        SELECT id, keeper FROM (
+            SELECT id, min(id) OVER (PARTITION BY book_link) AS keeper
+            FROM books WHERE book_link IS NOT NULL
+        ) linked
+        WHERE id <> keeper
+    """
+    queries = [
+        f"""
+        INSERT INTO favourites (user_id, book_id)
+        SELECT f.user_id, d.keeper
+        FROM favourites f JOIN ({duplicates}) d ON f.book_id = d.id
+        ON CONFLICT DO NOTHING
+        """,
+        f"""
+        INSERT INTO recents (user_id, book_id, opened_at)
+        SELECT r.user_id, d.keeper, max(r.opened_at)
+        FROM recents r JOIN ({duplicates}) d ON r.book_id = d.id
+        GROUP BY r.user_id, d.keeper
+        ON CONFLICT (user_id, book_id)
+        DO UPDATE SET opened_at = GREATEST(recents.opened_at, EXCLUDED.opened_at)
+        """,
+        f"""
+        INSERT INTO notes (book_id, note)
+        SELECT d.keeper, string_agg(n.note, E'\n\n' ORDER BY n.book_id)
+        FROM notes n JOIN ({duplicates}) d ON n.book_id = d.id
+        WHERE COALESCE(n.note, '') <> ''
+        GROUP BY d.keeper
+        ON CONFLICT (book_id) DO UPDATE SET note = CASE
+            WHEN COALESCE(notes.note, '') = '' THEN EXCLUDED.note
+            ELSE notes.note || E'\n\n' || EXCLUDED.note
+        END
+        """,
+        f"""
+        UPDATE book_files bf SET book_id = d.keeper
+        FROM ({duplicates}) d WHERE bf.book_id = d.id
+        """,
+        """
+        DELETE FROM books a USING books b
+        WHERE a.book_link = b.book_link AND a.id > b.id
+        """,
+    ]
+    async with database.transaction():
+        for query in queries:
+            await database.execute(query=query)
+    await _create_index_concurrently(
+        "books_book_link_key", "books (book_link)", unique=True
+    )
+    logger.info("Books book_link unique index created.")
+
+
+async def _create_recents_indexes() -> None:
+    # A user's recents newest-first; favourites are already served in order
+    # by their (user_id, book_id) primary key
+    await _create_index_concurrently(
+        "recents_user_opened_idx", "recents (user_id, opened_at DESC)"
+    )
+    logger.info("Recents indexes created (or already exist).")
+
+
+async def _create_book_files_indexes() -> None:
+    await _create_index_concurrently(
+        "book_files_folder_idx", "book_files (folder)"
+    )
+    logger.info("Book files indexes created (or already exist).")
+
+
+async def _create_scan_jobs_indexes() -> None:
+    # Allows only one running scan per folder
+    await _create_index_concurrently(
+        "scan_jobs_running_folder_key",
+        "scan_jobs (folder) WHERE status = 'running'",
+        unique=True,
+    )
+    logger.info("Scan jobs indexes created (or already exist).")
+
+
+# -------------------
+# Step 3: scan bookkeeping
+# -------------------
+async def _add_scan_columns() -> None:
+    await _add_books_edited_fields()
+    await _allow_unmatched_book_files()
+
+
+async def _add_books_edited_fields() -> None:
+    # Fields changed through /books/update; rescans leave them alone
+    query = """
+    ALTER TABLE books ADD COLUMN IF NOT EXISTS edited_fields TEXT[] NOT NULL DEFAULT '{}'
+    """
+    await database.execute(query=query)
+    logger.info("Books edited_fields column created (or already exists).")
+
+
+async def _allow_unmatched_book_files() -> None:
+    # Files that failed to parse are fingerprinted without a book, so rescans
+    # skip them until they change
+    query = "ALTER TABLE book_files ALTER COLUMN book_id DROP NOT NULL"
+    await database.execute(query=query)
+    logger.info("Book files book_id made nullable.")
+
+
+SCHEMA_STEPS = [
+    (1, _create_tables),
+    (2, _create_indexes),
+    (3, _add_scan_columns),
+]
@@ -0,0 +1,198 @@
+import os
+import re
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from typing import BinaryIO, Optional
+from urllib.parse import quote
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 1024 * 1024
+MAX_RANGES = 16  # more ranges than this are answered with the whole file
+
+_RANGE_RE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+def file_etag(stat: os.stat_result) -> str:
+    # Strong validator: changes whenever the file is replaced or rewritten
+    return f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_ranges(header: str, size: int) -> Optional[list[tuple[int, int]]]:
+    """Parse a `Range: bytes=...` header into sorted, merged (start, end)
+    inclusive pairs. Returns None for a header we should ignore (including a
+    syntactically invalid one such as `bytes=5-2`, RFC 9110 14.2) and [] when
+    no range is satisfiable."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    ranges = []
+    for part in spec.split(","):
+        match = _RANGE_RE.match(part)
+        if not match:
+            return None
+        first, last = match.groups()
+        if first == "" and last == "":
+            return None
+        if first == "":
+            start, end = max(size - int(last), 0), size - 1  # suffix range
+        elif last and int(last) < int(first):
+            return None
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        if start <= end and start < size:
+            ranges.append((start, end))
+    ranges.sort()
+    merged: list[tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class PdfFileResponse(Response):
+    """Serve a file with Range/multi-range, ETag and Last-Modified support.
+
+    The body goes out as large positional reads off the event loop. uvicorn
+    offers no sendfile path to ASGI apps, so there is no zero-copy branch.
+    """
+
+    media_type = "application/pdf"
+
+    def __init__(
+        self,
+        path: str,
+        stat: os.stat_result,
+        request_headers,
+        filename: str,
+        file: Optional[BinaryIO] = None,
+    ):
+        # `file`, when given, is an already open handle on path (whose `stat`
+        # it is); it is read instead of reopening path and closed when sent
+        super().__init__(status_code=200, media_type=self.media_type)
+        self.path = path
+        self.file = file
+        self.size = stat.st_size
+        self.parts: list[tuple[int, int, bytes]] = []  # (start, end, part header)
+        self.trailer = b""
+        etag = file_etag(stat)
+        self.headers["etag"] = etag
+        self.headers["last-modified"] = formatdate(stat.st_mtime, usegmt=True)
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["cache-control"] = "private, no-cache"
+        self.headers["content-disposition"] = f"inline; filename*=UTF-8''{quote(filename)}"
+
+        if self._not_modified(request_headers, etag, stat.st_mtime):
+            # No body and no representation headers on a 304
+            self.status_code = 304
+            del self.headers["content-length"]
+            del self.headers["content-type"]
+            return
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and (
+            if_range is None or self._if_range_matches(if_range, etag, stat.st_mtime)
+        ):
+            ranges = parse_ranges(range_header, self.size)
+            if ranges == []:
+                self.status_code = 416
+                self.headers["content-range"] = f"bytes */{self.size}"
+                self.headers["content-length"] = "0"
+                return
+            if ranges and len(ranges) <= MAX_RANGES:
+                self._set_ranges(ranges)
+                return
+        self.parts = [(0, self.size - 1, b"")] if self.size else []
+        self.headers["content-length"] = str(self.size)
+
+    @staticmethod
+    def _not_modified(request_headers, etag: str, mtime: float) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return etag in tags or "*" in tags
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _if_range_matches(if_range: str, etag: str, mtime: float) -> bool:
+        # An entity tag must match strongly; a date must equal Last-Modified
+        # exactly (RFC 9110 13.1.5). Anything else sends the whole file
+        if_range = if_range.strip()
+        if if_range.startswith(('"', "W/")):
+            return if_range == etag
+        try:
+            return int(mtime) == parsedate_to_datetime(if_range).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    def _set_ranges(self, ranges: list[tuple[int, int]]) -> None:
+        self.status_code = 206
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.parts = [(start, end, b"")]
+            self.headers["content-range"] = f"bytes {start}-{end}/{self.size}"
+            self.headers["content-length"] = str(end - start + 1)
+            return
+        boundary = secrets.token_hex(16)
+        self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+        length = 0
+        for start, end in ranges:
+            part_header = (
+                f"\r\n--{boundary}\r\n"
+                f"Content-Type: {self.media_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{self.size}\r\n\r\n"
+            ).encode("latin-1")
+            self.parts.append((start, end, part_header))
+            length += len(part_header) + end - start + 1
+        self.trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+        self.headers["content-length"] = str(length + len(self.trailer))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self._send(scope, send)
+        finally:
+            if self.file is not None:
+                self.file.close()
+
+    async def _send(self, scope: Scope, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if scope["method"] == "HEAD" or not self.parts:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        with self.file or open(self.path, "rb") as fh:
+            for start, end, part_header in self.parts:
+                if part_header:
+                    await send(
+                        {"type": "http.response.body", "body": part_header, "more_body": True}
+                    )
+                offset = start
+                while offset <= end:
+                    count = min(CHUNK_SIZE, end - offset + 1)
+                    chunk = await anyio.to_thread.run_sync(
+                        os.pread, fh.fileno(), count, offset
+                    )
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+        await send({"type": "http.response.body", "body": self.trailer})
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+import os
+import secrets
+from typing import Awaitable, Callable, Iterable, Optional
+
+from database import database
+
+# -------------------
+# Cross-worker cache invalidation
+# -------------------
+# Every uvicorn worker keeps its own in-process caches. Writes publish the keys
+# they touched on a Postgres NOTIFY channel; each worker LISTENs on it and
+# evicts its copies, so caches stay coherent at any worker count.
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "library_invalidate")
+# Seconds before re-LISTENing after the listener connection drops
+INVALIDATION_RETRY = float(os.getenv("INVALIDATION_RETRY", 5.0))
+# NOTIFY payloads are capped at 8000 bytes; bigger key sets mean "everything"
+INVALIDATION_MAX_KEYS = 500
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("INVALIDATION")
+
+Handler = Callable[[Optional[list]], Awaitable[None]]
+
+# Identifies this worker's own messages, which it has already applied locally
+_ORIGIN = secrets.token_hex(8)
+_handlers: dict[str, list[Handler]] = {}
+_pending: set[asyncio.Task] = set()
+
+
+def subscribe(scope: str, handler: Handler) -> None:
+    """Call handler(keys) when another worker changes `scope`.
+    keys is None when everything in the scope must be dropped."""
+    _handlers.setdefault(scope, []).append(handler)
+
+
+async def publish(scope: str, keys: Optional[Iterable] = None) -> None:
+    """Announce that `keys` of `scope` changed (None: all of them). The caller
+    evicts its own copies; other workers are told through NOTIFY. Failures are
+    logged, never raised, so a write is not undone by a lost notification."""
+    if keys is not None:
+        keys = list(keys)
+        if not keys:
+            return
+        if len(keys) > INVALIDATION_MAX_KEYS:
+            keys = None
+    payload = json.dumps({"origin": _ORIGIN, "scope": scope, "keys": keys})
+    try:
+        await database.execute(
+            query="SELECT pg_notify(:channel, :payload)",
+            values={"channel": INVALIDATION_CHANNEL, "payload": payload},
+        )
+    except Exception as e:
+        logger.warning(f"Publishing {scope} invalidation failed: {e}")
+
+
+async def _dispatch(scope: str, keys: Optional[list]) -> None:
+    for handler in _handlers.get(scope, []):
+        try:
+            await handler(keys)
+        except Exception as e:
+            logger.error(f"Invalidating {scope} failed: {e}")
+
+
+async def _dispatch_all() -> None:
+    for scope in list(_handlers):
+        await _dispatch(scope, None)
+
+
+def _on_notification(connection, pid, channel, payload) -> None:
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logger.warning(f"Ignoring malformed invalidation: {payload!r}")
+        return
+    if message.get("origin") == _ORIGIN:
+        return
+    task = asyncio.create_task(_dispatch(message["scope"], message.get("keys")))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+class InvalidationListener:
+    """Holds one pooled connection LISTENing on the invalidation channel,
+    reconnecting when it drops. Notifications sent while disconnected are
+    lost, so every subscriber is flushed after a reconnect."""
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen(self) -> None:
+        reconnecting = False
+        while True:
+            try:
+                async with database.connection() as connection:
+                    raw = connection.raw_connection
+                    lost = asyncio.Event()
+                    raw.add_termination_listener(lambda _: lost.set())
+                    await raw.add_listener(INVALIDATION_CHANNEL, _on_notification)
+                    logger.info(f"Listening on {INVALIDATION_CHANNEL}")
+                    try:
+                        if reconnecting:
+                            await _dispatch_all()
+                        await lost.wait()
+                    finally:
+                        if not raw.is_closed():
+                            await raw.remove_listener(
+                                INVALIDATION_CHANNEL, _on_notification
+                            )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Invalidation listener lost its connection: {e}")
+            reconnecting = True
+            await asyncio.sleep(INVALIDATION_RETRY)
+
+
+invalidation_listener = InvalidationListener()
@@ -1,5 +1,8 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Literal
+from datetime import datetime
+
+BookSort = Literal["id", "title", "author", "year"]
 
 
 class BookOut(BaseModel):
@@ -19,6 +22,12 @@ class BookListItem(BaseModel):
     image_path: str
 
 
+class BookSuggestion(BaseModel):
+    id: int
+    title: str
+    author: str
+
+
 # class BookCreate(BaseModel):
 #     title: str
 #     author: str
@@ -34,18 +43,37 @@ class BookUpdate(BaseModel):
     author: Optional[str] = None
     year: Optional[int] = None
     image_path: Optional[str] = None
-    book_link: str
+    # Accepted for older clients but ignored: the PDF written is always the one
+    # catalogued for book_id
+    book_link: Optional[str] = None
 
 
 # Response Models
 class BookListResponse(BaseModel):
     books: List[BookListItem]
+    next_cursor: Optional[str] = None
+
+
+class BookSuggestResponse(BaseModel):
+    suggestions: List[BookSuggestion]
 
 
 class BookDetailResponse(BaseModel):
     book_detail: BookOut
 
 
+class BookFileUrlResponse(BaseModel):
+    # Relative URL of the file; its query also authorizes /books/{id}/pages
+    url: str
+    expires_at: int
+
+
+class BookViewResponse(BaseModel):
+    book_detail: BookOut
+    is_favourite: bool
+    note: Optional[str] = None
+
+
 class BookResponse(BaseModel):
     message: str
     book: BookOut
@@ -54,3 +82,23 @@ class BookResponse(BaseModel):
 class BooksResponse(BaseModel):
     message: str
     books: dict
+
+
+class ScanJob(BaseModel):
+    job_id: int
+    folder: str
+    status: str
+    total: int
+    processed: int
+    errors: int
+    files_per_second: float
+    eta_seconds: Optional[float] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+
+class ScanJobResponse(BaseModel):
+    message: str
+    job: ScanJob
@@ -1,11 +1,18 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 
+# Most book ids a single batch request may carry
+MAX_BATCH_SIZE = 200
+
 
 class FavouriteBookAdd(BaseModel):
     book_id: int
 
 
+class FavouriteBatch(BaseModel):
+    book_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
 class FavouriteBookListItem(BaseModel):
     id: int
     title: Optional[str] = None
@@ -23,5 +30,14 @@ class FavouriteBookListResponse(BaseModel):
     favourite_books: List[FavouriteBookListItem]
 
 
+class FavouriteBatchResponse(BaseModel):
+    message: str
+    book_ids: List[int]
+
+
 class IsFavouriteResponse(BaseModel):
     is_favourite: bool
+
+
+class FavouriteStatusResponse(BaseModel):
+    favourite_ids: List[int]
@@ -22,3 +22,4 @@ class RecentBookListItem(BaseModel):
 
 class RecentBookListResponse(BaseModel):
     recent_books: List[RecentBookListItem]
+    next_cursor: Optional[str] = None
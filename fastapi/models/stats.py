@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+
+
+class PoolStats(BaseModel):
+    size: int = 0
+    min_size: int = 0
+    max_size: int = 0
+    in_use: int = 0
+    idle: int = 0
+    waiting: int = 0
+    acquires: int = 0
+    acquire_timeouts: int = 0
+    acquire_ms_p50: float = 0.0
+    acquire_ms_p99: float = 0.0
+    acquire_ms_max: float = 0.0
+
+
+class CompressionStats(BaseModel):
+    compressed: int
+    skipped_over_budget: int
+    cpu_seconds: float
+    bytes_in: int
+    bytes_out: int
+
+
+# Response Models
+class StatsResponse(BaseModel):
+    pool: PoolStats
+    compression: CompressionStats
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO
+
+from pypdf import PdfReader, PdfWriter
+
+# Page windows cut out of books, cached on disk and shared by all workers
+PAGE_CACHE_DIR = os.getenv(
+    "PAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "library_page_cache")
+)
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", 2 * 1024**3))
+PAGE_RANGE_MAX = int(os.getenv("PAGE_RANGE_MAX", 50))
+# Rebuilds tried when a window is evicted before it could be opened
+PAGE_WINDOW_OPEN_ATTEMPTS = 3
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("PAGE CACHE")
+
+_in_flight: dict[str, asyncio.Future] = {}
+_background: set[asyncio.Task] = set()
+
+
+def cache_key(stat: os.stat_result, first: int, last: int) -> str:
+    # The file fingerprint is part of the key, so edited books never hit stale windows
+    fingerprint = f"{stat.st_ino}-{stat.st_size}-{stat.st_mtime_ns}-{first}-{last}"
+    return hashlib.sha256(fingerprint.encode()).hexdigest()
+
+
+def _extract_pages(source: Path, target: Path, first: int, last: int) -> None:
+    # Write pages first..last (1-based, inclusive) of source to target
+    with open(source, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        reader = PdfReader(mm)
+        page_count = len(reader.pages)
+        if first > page_count:
+            raise IndexError(f"Book has only {page_count} pages")
+        writer = PdfWriter()
+        for index in range(first - 1, min(last, page_count)):
+            writer.add_page(reader.pages[index])
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                writer.write(out)
+            os.replace(tmp_path, target)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def _touch(target: Path) -> None:
+    # Record the hit in atime only; mtime stays put so the window's ETag is stable
+    stat = os.stat(target)
+    os.utime(target, ns=(time.time_ns(), stat.st_mtime_ns))
+
+
+def _evict(keep: Path) -> None:
+    # LRU by atime (hits touch their file); runs after each new window
+    entries = []
+    total = 0
+    with os.scandir(PAGE_CACHE_DIR) as scan:
+        for entry in scan:
+            if entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                entries.append((stat.st_atime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= PAGE_CACHE_MAX_BYTES:
+            break
+        if path == str(keep):
+            continue
+        try:
+            os.unlink(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+def _build(source: Path, target: Path, first: int, last: int) -> None:
+    _extract_pages(source, target, first, last)
+    _evict(target)
+
+
+async def get_page_window(source: Path, first: int, last: int) -> Path:
+    """Return the cached PDF holding pages first..last of source, building it
+    once even when several requests ask for it at the same time."""
+    stat = await asyncio.to_thread(os.stat, source)
+    key = cache_key(stat, first, last)
+    target = Path(PAGE_CACHE_DIR) / f"{key}.pdf"
+    try:
+        await asyncio.to_thread(_touch, target)  # cache hit: mark recently used
+        return target
+    except FileNotFoundError:
+        pass
+
+    future = _in_flight.get(key)
+    if future is None:
+        future = asyncio.get_running_loop().create_future()
+        _in_flight[key] = future
+        try:
+            await asyncio.to_thread(_build, source, target, first, last)
+            future.set_result(target)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here; waiters re-raise it below
+        finally:
+            del _in_flight[key]
+    return await future
+
+
+def _open(target: Path) -> tuple[BinaryIO, os.stat_result]:
+    fh = open(target, "rb")
+    return fh, os.fstat(fh.fileno())
+
+
+async def open_page_window(
+    source: Path, first: int, last: int
+) -> tuple[BinaryIO, os.stat_result]:
+    """Open the window for pages first..last. Holding the file open keeps it
+    readable even if eviction unlinks it before the response is sent; a window
+    evicted before it could be opened is built again."""
+    for _ in range(PAGE_WINDOW_OPEN_ATTEMPTS):
+        target = await get_page_window(source, first, last)
+        try:
+            return await asyncio.to_thread(_open, target)
+        except FileNotFoundError:
+            logger.info(f"Window {target.name} evicted before opening, rebuilding")
+    raise FileNotFoundError(
+        f"Window for pages {first}-{last} of {source} keeps vanishing"
+    )
+
+
+def prefetch_next_window(source: Path, first: int, last: int, page_count: int) -> None:
+    # Readers page forward, so warm the following window in the background
+    span = last - first + 1
+    next_first = last + 1
+    if next_first > page_count:
+        return
+
+    async def _prefetch():
+        try:
+            await get_page_window(
+                source, next_first, min(next_first + span - 1, page_count)
+            )
+        except Exception as e:
+            logger.info(f"Prefetch of pages {next_first}+ for {source} skipped: {e}")
+
+    task = asyncio.create_task(_prefetch())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
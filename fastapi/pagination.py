@@ -0,0 +1,83 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional, Sequence
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+# -------------------
+# Keyset cursors
+# -------------------
+# A cursor is an opaque, url-safe token holding the sort key of the last row
+# of a page: {"s": sort, "v": sort value, "id": row id}. The next page starts
+# strictly after (value, id), so paging never uses OFFSET.
+def _int_value(value: Any) -> int:
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError("expected an integer")
+    return value
+
+
+def _float_value(value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError("expected a number")
+    return float(value)
+
+
+def _str_value(value: Any) -> str:
+    if not isinstance(value, str):
+        raise TypeError("expected a string")
+    return value
+
+
+def _datetime_value(value: Any) -> datetime:
+    return datetime.fromisoformat(_str_value(value))
+
+
+# Sort -> parser of its cursor value, so a tampered cursor is rejected here
+# instead of failing inside the query
+CURSOR_VALUE_PARSERS: dict[str, Callable[[Any], Any]] = {
+    "id": _int_value,
+    "year": _int_value,
+    "title": _str_value,
+    "author": _str_value,
+    "rank": _float_value,
+    "opened_at": _datetime_value,
+}
+
+
+def encode_cursor(sort: str, value: Any, last_id: int) -> str:
+    payload = json.dumps({"s": sort, "v": value, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], sort: str) -> Optional[tuple[Any, int]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, last_id = payload["v"], _int_value(payload["id"])
+        cursor_sort = payload["s"]
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError):
+        raise ValueError("Malformed cursor")
+    if cursor_sort != sort:
+        raise ValueError(f"Cursor was issued for sort '{cursor_sort}', not '{sort}'")
+    try:
+        value = CURSOR_VALUE_PARSERS[sort](value)
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+    return value, last_id
+
+
+def paginate(
+    rows: Sequence[Any], limit: int, sort: str, key: Callable[[Any], Any]
+) -> tuple[list[Any], Optional[str]]:
+    """Split a `limit + 1` row fetch into the page and the cursor for the next one."""
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor(sort, key(last), last["id"])
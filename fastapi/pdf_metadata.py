@@ -0,0 +1,239 @@
+# PDF metadata readers and writers. Kept free of database/app imports so
+# process-pool workers spawned by utilities.extract_pdf_metadata start quickly.
+from io import BytesIO
+from pathlib import Path
+import mmap
+import os
+import re
+import tempfile
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NumberObject,
+    TextStringObject,
+)
+
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)")
+
+
+def extract_year_from_creation_date(metadata):
+    creation_date = metadata.get("/CreationDate")
+    if (
+        creation_date and len(creation_date) >= 6 and creation_date.startswith("D:")
+    ):  # creation_date looks like "D:YYYYMMDDHHmmSS"
+        return int(creation_date[2:6])  # extract YYYY as int
+    return 0
+
+
+def extract_year(metadata):
+    # /Year is what /books/update writes; fall back to the creation date
+    try:
+        year = int(str(metadata.get("/Year", "")).strip())
+    except ValueError:
+        year = 0
+    return year if year > 0 else extract_year_from_creation_date(metadata)
+
+
+def safe_str(val):
+    if isinstance(val, bytes):
+        val = val.decode("utf-8", errors="ignore")
+    return str(val).replace("\x00", "")
+
+
+def _file_info(file: Path, reader: PdfReader, num_pages: int) -> dict:
+    metadata = reader.metadata or {}
+    year = extract_year(metadata)
+    file_info = {
+        "File": file.name,
+        "Title": metadata.get("/Title", "Unknown Title"),
+        "Author": metadata.get("/Author", "Unknown"),
+        "Year": year,
+        "Pages": num_pages,
+    }
+    # Plain strings so records can cross process boundaries
+    file_info.update({key: safe_str(value) for key, value in metadata.items()})
+    return file_info
+
+
+def read_pdf_metadata_fast(file: Path) -> dict:
+    # Memory-map the file so pypdf only touches the pages of it that hold the
+    # xref, trailer, Info and catalog (a path would be read fully into memory),
+    # and take the page count from /Root /Pages /Count instead of walking the
+    # page tree. Raises on anything unexpected so the caller can fall back.
+    with open(file, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        reader = PdfReader(mm)
+        if reader.is_encrypted:
+            raise ValueError("Encrypted PDF")
+        num_pages = reader.trailer["/Root"]["/Pages"]["/Count"]
+        if not isinstance(num_pages, int) or num_pages <= 0:
+            raise ValueError(f"Unusable /Count: {num_pages!r}")
+        file_info = _file_info(file, reader, int(num_pages))
+        file_info["Title"] = safe_str(file_info["Title"])
+        file_info["Author"] = safe_str(file_info["Author"])
+        return file_info
+
+
+def read_pdf_metadata_full(file: Path) -> dict:
+    reader = PdfReader(file)
+    return _file_info(file, reader, len(reader.pages))
+
+
+def read_pdf_metadata(file: Path) -> dict:
+    try:
+        try:
+            return read_pdf_metadata_fast(file)
+        except Exception:
+            return read_pdf_metadata_full(file)
+    except Exception as e:
+        return {"File": file.name, "Error": str(e)}
+
+
+# -------------------
+# Metadata writes
+# -------------------
+def _serialize(obj) -> bytes:
+    buffer = BytesIO()
+    obj.write_to_stream(buffer)
+    return buffer.getvalue()
+
+
+def _last_startxref(data) -> int:
+    tail_start = max(len(data) - 2048, 0)
+    matches = list(_STARTXREF_RE.finditer(data[tail_start:]))
+    if not matches:
+        raise ValueError("startxref not found")
+    return int(matches[-1].group(1))
+
+
+def _incremental_update_bytes(data, reader: PdfReader, metadata: dict) -> bytes:
+    """Build the bytes to append so the file carries a new Info dictionary.
+
+    Follows the PDF incremental-update model: a new revision of the Info
+    object, a one-entry cross-reference section (classic table or xref stream,
+    matching the previous section) and a trailer pointing back via /Prev.
+    """
+    trailer = reader.trailer
+    prev_xref = _last_startxref(data)
+    size = int(trailer["/Size"])
+
+    info = DictionaryObject()
+    for key, value in (reader.metadata or {}).items():
+        info[NameObject(key)] = value
+    for key, value in metadata.items():
+        info[NameObject(key)] = TextStringObject(value)
+
+    info_ref = trailer.raw_get("/Info") if "/Info" in trailer else None
+    if isinstance(info_ref, IndirectObject):
+        info_num, info_gen = info_ref.idnum, info_ref.generation
+    else:
+        info_num, info_gen = size, 0
+        size += 1
+
+    base = len(data)
+    out = BytesIO()
+    if data[-1:] != b"\n":
+        out.write(b"\n")
+    info_offset = base + out.tell()
+    out.write(f"{info_num} {info_gen} obj\n".encode())
+    out.write(_serialize(info))
+    out.write(b"\nendobj\n")
+
+    new_trailer = {
+        "/Root": trailer.raw_get("/Root"),
+        "/Info": IndirectObject(info_num, info_gen, reader),
+        "/Prev": NumberObject(prev_xref),
+    }
+    if "/ID" in trailer:
+        new_trailer["/ID"] = trailer.raw_get("/ID")
+
+    xref_offset = base + out.tell()
+    if bytes(data[prev_xref : prev_xref + 4]) == b"xref":
+        out.write(b"xref\n0 1\n0000000000 65535 f \n")
+        out.write(f"{info_num} 1\n{info_offset:010d} {info_gen:05d} n \n".encode())
+        trailer_dict = DictionaryObject({NameObject("/Size"): NumberObject(size)})
+        trailer_dict.update({NameObject(k): v for k, v in new_trailer.items()})
+        out.write(b"trailer\n" + _serialize(trailer_dict) + b"\n")
+    else:
+        # Previous section is an xref stream: append another (uncompressed) one
+        xref_num = size
+        size += 1
+        rows = [(info_num, 1, info_offset, info_gen), (xref_num, 1, xref_offset, 0)]
+        rows.sort()
+        stream_data = b"".join(
+            kind.to_bytes(1, "big") + offset.to_bytes(4, "big") + gen.to_bytes(2, "big")
+            for _, kind, offset, gen in rows
+        )
+        xref_dict = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/XRef"),
+                NameObject("/Size"): NumberObject(size),
+                NameObject("/W"): ArrayObject([NumberObject(n) for n in (1, 4, 2)]),
+                NameObject("/Index"): ArrayObject(
+                    [NumberObject(n) for row in rows for n in (row[0], 1)]
+                ),
+                NameObject("/Length"): NumberObject(len(stream_data)),
+            }
+        )
+        xref_dict.update({NameObject(k): v for k, v in new_trailer.items()})
+        out.write(f"{xref_num} 0 obj\n".encode() + _serialize(xref_dict))
+        out.write(b"\nstream\n" + stream_data + b"\nendstream\nendobj\n")
+    out.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def _rewrite_atomically(path: Path, metadata: dict) -> None:
+    # Full rewrite into a temp file beside the original, then an atomic rename
+    reader = PdfReader(path)
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    merged = dict(reader.metadata or {})
+    merged.update(metadata)
+    writer.add_metadata(merged)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            writer.write(fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    dir_fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def write_pdf_metadata(path: Path, metadata: dict) -> str:
+    """Write Info entries, appending an incremental update when possible.
+
+    Cost is proportional to the metadata, not the book. Returns "incremental"
+    or "rewrite" (encrypted or unparseable files need the full rewrite).
+    """
+    try:
+        with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            reader = PdfReader(mm)
+            if reader.is_encrypted:
+                raise ValueError("Encrypted PDF")
+            update = _incremental_update_bytes(mm, reader, metadata)
+    except Exception:
+        _rewrite_atomically(path, metadata)
+        return "rewrite"
+
+    with open(path, "r+b") as fh:
+        original_size = fh.seek(0, os.SEEK_END)
+        try:
+            fh.write(update)
+            fh.flush()
+            os.fsync(fh.fileno())
+        except BaseException:
+            # Never leave a half-written revision behind the previous %%EOF
+            fh.truncate(original_size)
+            raise
+    return "incremental"
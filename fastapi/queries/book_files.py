@@ -0,0 +1,52 @@
+# -------------------
+# Scanned file fingerprints (incremental rescans)
+# -------------------
+from typing import Any, List
+from database import database
+
+
+# Fingerprints recorded for files directly inside a folder
+async def get_file_fingerprints(folder: str) -> dict[str, tuple[int, int, int]]:
+    query = """
+    SELECT path, size, mtime_ns, inode
+    FROM book_files
+    WHERE folder = :folder
+    """
+    rows = await database.fetch_all(query=query, values={"folder": folder})
+    return {row["path"]: (row["size"], row["mtime_ns"], row["inode"]) for row in rows}
+
+
+# Insert or refresh fingerprints in one statement. book_id is None for files
+# that failed to parse; a book already linked to the path stays linked.
+async def upsert_file_fingerprints(fingerprints: List[dict[str, Any]]) -> None:
+    if not fingerprints:
+        return
+    query = """
+    INSERT INTO book_files (path, folder, size, mtime_ns, inode, book_id)
+    SELECT * FROM unnest(
+        CAST(:paths AS text[]), CAST(:folders AS text[]), CAST(:sizes AS bigint[]),
+        CAST(:mtimes AS bigint[]), CAST(:inodes AS bigint[]), CAST(:book_ids AS int[])
+    )
+    ON CONFLICT (path) DO UPDATE
+    SET size = EXCLUDED.size,
+        mtime_ns = EXCLUDED.mtime_ns,
+        inode = EXCLUDED.inode,
+        book_id = COALESCE(EXCLUDED.book_id, book_files.book_id)
+    """
+    values = {
+        "paths": [fp["path"] for fp in fingerprints],
+        "folders": [fp["folder"] for fp in fingerprints],
+        "sizes": [fp["size"] for fp in fingerprints],
+        "mtimes": [fp["mtime_ns"] for fp in fingerprints],
+        "inodes": [fp["inode"] for fp in fingerprints],
+        "book_ids": [fp["book_id"] for fp in fingerprints],
+    }
+    await database.execute(query=query, values=values)
+
+
+# Forget fingerprints of files that no longer exist
+async def delete_file_fingerprints(paths: List[str]) -> None:
+    if not paths:
+        return
+    query = "DELETE FROM book_files WHERE path = ANY(:paths)"
+    await database.execute(query=query, values={"paths": paths})
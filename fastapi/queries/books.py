@@ -1,5 +1,15 @@
+import asyncio
+import re
+from collections import OrderedDict
 from typing import Any, Optional, List
-from database import database
+from database import database, fetch_all_prepared, fetch_one_prepared
+from autocomplete import AUTOCOMPLETE_ENABLED, suggest_index
+from cache import bump_catalogue_version
+from invalidation import publish, subscribe
+
+# book_id -> book_link for file delivery; small LRU, evicted on delete
+BOOK_LINK_CACHE_SIZE = 4096
+_book_link_cache: "OrderedDict[int, str]" = OrderedDict()
 
 
 # Add a new book
@@ -19,40 +29,188 @@ async def add_book(
         "image_path": image_path,
         "book_link": book_link,
     }
-    return await database.fetch_one(query=query, values=values)
+    book = await database.fetch_one(query=query, values=values)
+    if book:
+        suggest_index.update([(book["id"], book["title"], book["author"])])
+        bump_catalogue_version()
+        await publish("books", [book["id"]])
+    return book
 
 
-# Add multiple books in bulk
-async def add_books_bulk(books: List[dict[str, Any]]) -> None:
+# Add multiple books in bulk (one statement, arrays unnested server-side).
+# Links already in the catalogue are skipped; only inserted rows are returned.
+async def add_books_bulk(books: List[dict[str, Any]]) -> List[dict[str, Any]]:
     query = """
     INSERT INTO books (title, author, year, pages, image_path, book_link)
-    VALUES (:title, :author, :year, :pages, :image_path, :book_link)
+    SELECT * FROM unnest(
+        CAST(:titles AS text[]), CAST(:authors AS text[]), CAST(:years AS int[]),
+        CAST(:pages AS int[]), CAST(:image_paths AS text[]), CAST(:book_links AS text[])
+    )
+    ON CONFLICT (book_link) DO NOTHING
+    RETURNING id, title, author, book_link
     """
-    await database.execute_many(query=query, values=books)
+    values = {
+        "titles": [book["title"] for book in books],
+        "authors": [book["author"] for book in books],
+        "years": [book["year"] for book in books],
+        "pages": [book["pages"] for book in books],
+        "image_paths": [book["image_path"] for book in books],
+        "book_links": [book["book_link"] for book in books],
+    }
+    added = await database.fetch_all(query=query, values=values)
+    if added:
+        suggest_index.update(
+            (book["id"], book["title"], book["author"]) for book in added
+        )
+        bump_catalogue_version()
+        await publish("books", [book["id"] for book in added])
+    return added
 
 
-# Get all books (basic info only)
-async def get_all_books() -> list[dict[str, Any]]:
-    query = "SELECT id, title, author, image_path FROM books"
-    return await database.fetch_all(query=query)
+# Columns a book listing can be sorted by (keyset pagination, ties broken by id)
+BOOK_SORT_COLUMNS = {
+    "id": "id",
+    "title": "title",
+    "author": "author",
+    "year": "COALESCE(year, 0)",
+}
+
+
+def book_sort_value(row, sort: str) -> Any:
+    if sort == "id":
+        return row["id"]
+    if sort == "year":
+        return row["year"] or 0
+    if sort == "rank":
+        return row["rank"]
+    return row[sort]
+
+
+# Fetch one keyset page of books matching the given conditions
+async def _fetch_books_page(
+    conditions: list[str],
+    values: dict[str, Any],
+    sort: str,
+    after: Optional[tuple[Any, int]],
+    limit: int,
+) -> list[dict[str, Any]]:
+    column = BOOK_SORT_COLUMNS[sort]
+    conditions = list(conditions)
+    if after is not None:
+        if sort == "id":
+            conditions.append("id > :after_id")
+        else:
+            conditions.append(f"({column}, id) > (:after_value, :after_id)")
+            values["after_value"] = after[0]
+        values["after_id"] = after[1]
+
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order_clause = "id" if sort == "id" else f"{column}, id"
+    query = f"""
+    SELECT id, title, author, year, image_path
+    FROM books
+    {where_clause}
+    ORDER BY {order_clause}
+    LIMIT :limit
+    """
+    values["limit"] = limit
+    return await fetch_all_prepared(query, values)
+
+
+# Get a page of books (basic info only)
+async def get_all_books(
+    sort: str = "id", after: Optional[tuple[Any, int]] = None, limit: int = 50
+) -> list[dict[str, Any]]:
+    return await _fetch_books_page([], {}, sort, after, limit)
 
 
 # Get book details by ID
 async def get_book_by_id(book_id: int) -> Optional[dict[str, Any]]:
     query = "SELECT * FROM books WHERE id = :book_id"
-    return await database.fetch_one(query=query, values={"book_id": book_id})
+    return await fetch_one_prepared(query, {"book_id": book_id})
+
+
+# Everything the detail page shows for one user, in one query
+async def get_book_view(book_id: int, user_id: int) -> Optional[dict[str, Any]]:
+    query = """
+    SELECT b.id, b.title, b.author, b.year, b.pages, b.image_path, b.book_link,
+        f.book_id IS NOT NULL AS is_favourite, n.note
+    FROM books b
+    LEFT JOIN favourites f ON f.book_id = b.id AND f.user_id = :user_id
+    LEFT JOIN notes n ON n.book_id = b.id
+    WHERE b.id = :book_id
+    """
+    return await fetch_one_prepared(query, {"book_id": book_id, "user_id": user_id})
+
+
+# Get a book's link, served from a small in-process cache
+async def get_book_link(book_id: int) -> Optional[str]:
+    book_link = _book_link_cache.get(book_id)
+    if book_link is not None:
+        _book_link_cache.move_to_end(book_id)
+        return book_link
+    query = "SELECT book_link FROM books WHERE id = :book_id"
+    row = await fetch_one_prepared(query, {"book_id": book_id})
+    if not row or not row["book_link"]:
+        return None
+    _book_link_cache[book_id] = row["book_link"]
+    if len(_book_link_cache) > BOOK_LINK_CACHE_SIZE:
+        _book_link_cache.popitem(last=False)
+    return row["book_link"]
 
 
 # Find books by title (partial match)
-async def find_books_by_title(title: str) -> list[dict[str, Any]]:
-    query = "SELECT * FROM books WHERE title ILIKE :title"
-    return await database.fetch_all(query=query, values={"title": f"%{title}%"})
+async def find_books_by_title(
+    title: str,
+    sort: str = "id",
+    after: Optional[tuple[Any, int]] = None,
+    limit: int = 50,
+) -> list[dict[str, Any]]:
+    return await _fetch_books_page(
+        ["title ILIKE :title"], {"title": f"%{title}%"}, sort, after, limit
+    )
 
 
 # Find books by author (partial match)
-async def find_books_by_author(author: str) -> list[dict[str, Any]]:
-    query = "SELECT * FROM books WHERE author ILIKE :author"
-    return await database.fetch_all(query=query, values={"author": f"%{author}%"})
+async def find_books_by_author(
+    author: str,
+    sort: str = "id",
+    after: Optional[tuple[Any, int]] = None,
+    limit: int = 50,
+) -> list[dict[str, Any]]:
+    return await _fetch_books_page(
+        ["author ILIKE :author"], {"author": f"%{author}%"}, sort, after, limit
+    )
+
+
+# Ranked search across title and author (full-text, substring and fuzzy).
+# ILIKE and % are served by the trigram indexes, @@ by the tsvector index.
+async def search_books(
+    q: str, after: Optional[tuple[Any, int]] = None, limit: int = 50
+) -> list[dict[str, Any]]:
+    values: dict[str, Any] = {"q": q, "pattern": f"%{q}%", "limit": limit}
+    keyset_clause = ""
+    if after is not None:
+        keyset_clause = "WHERE (rank, id) < (:after_rank, :after_id)"
+        values["after_rank"] = float(after[0])
+        values["after_id"] = after[1]
+
+    query = f"""
+    SELECT id, title, author, year, image_path, rank
+    FROM (
+        SELECT id, title, author, year, image_path,
+            (ts_rank(search_vector, query)
+             + GREATEST(similarity(title, :q), similarity(author, :q)))::float8 AS rank
+        FROM books, websearch_to_tsquery('simple', :q) AS query
+        WHERE search_vector @@ query
+           OR title ILIKE :pattern OR author ILIKE :pattern
+           OR title % :q OR author % :q
+    ) ranked
+    {keyset_clause}
+    ORDER BY rank DESC, id DESC
+    LIMIT :limit
+    """
+    return await fetch_all_prepared(query, values)
 
 
 # Update book by ID
@@ -82,6 +240,15 @@ async def update_book(
     if not updates:
         return None  # Nothing to update
 
+    # Remember hand-edited fields so rescans of the file don't revert them
+    edited = [field for field in ("title", "author", "year") if field in values]
+    if edited:
+        updates.append(
+            "edited_fields = ARRAY(SELECT DISTINCT unnest("
+            "edited_fields || CAST(:edited AS text[])))"
+        )
+        values["edited"] = edited
+
     set_clause = ", ".join(updates)
     query = f"""
     UPDATE books
@@ -89,24 +256,202 @@ async def update_book(
     WHERE id = :book_id
     RETURNING *
     """
-    return await database.fetch_one(query=query, values=values)
+    book = await database.fetch_one(query=query, values=values)
+    if book:
+        suggest_index.update([(book["id"], book["title"], book["author"])])
+        bump_catalogue_version()
+        await publish("books", [book["id"]])
+    return book
 
 
 # Delete a book by ID
 async def delete_book(book_id: int) -> Optional[dict[str, Any]]:
     query = "DELETE FROM books WHERE id = :book_id RETURNING *"
-    return await database.fetch_one(query=query, values={"book_id": book_id})
+    book = await database.fetch_one(query=query, values={"book_id": book_id})
+    if book:
+        suggest_index.update(removals=[book_id])
+        _book_link_cache.pop(book_id, None)
+        bump_catalogue_version()
+        await publish("books", [book_id])
+    return book
 
 
 # Truncate the books table
 async def truncate_books_table() -> bool:
     query = "TRUNCATE TABLE books RESTART IDENTITY CASCADE"
     await database.execute(query=query)
+    suggest_index.clear()
+    _book_link_cache.clear()
+    bump_catalogue_version()
+    await publish("books")
     return True
 
 
-# Check if book exists by link
-async def book_exists(book_link: str) -> bool:
-    query = "SELECT 1 FROM books WHERE book_link = :book_link"
-    result = await database.fetch_one(query=query, values={"book_link": book_link})
-    return result is not None
+# Map book links to ids for the links that are already catalogued
+async def get_book_ids_by_links(book_links: List[str]) -> dict[str, int]:
+    if not book_links:
+        return {}
+    query = "SELECT id, book_link FROM books WHERE book_link = ANY(:book_links)"
+    rows = await database.fetch_all(query=query, values={"book_links": book_links})
+    return {row["book_link"]: row["id"] for row in rows}
+
+
+# Refresh file-derived fields of books whose PDFs changed on disk (one statement).
+# Fields edited through /books/update keep their edited values.
+async def refresh_books_from_files(books: List[dict[str, Any]]) -> List[dict[str, Any]]:
+    if not books:
+        return []
+    query = """
+    UPDATE books
+    SET title = CASE WHEN 'title' = ANY(edited_fields) THEN books.title ELSE f.title END,
+        author = CASE WHEN 'author' = ANY(edited_fields) THEN books.author ELSE f.author END,
+        year = CASE WHEN 'year' = ANY(edited_fields) THEN books.year ELSE f.year END,
+        pages = f.pages
+    FROM unnest(
+        CAST(:book_links AS text[]), CAST(:titles AS text[]), CAST(:authors AS text[]),
+        CAST(:years AS int[]), CAST(:pages AS int[])
+    ) AS f(book_link, title, author, year, pages)
+    WHERE books.book_link = f.book_link
+    RETURNING books.id, books.title, books.author
+    """
+    values = {
+        "book_links": [book["book_link"] for book in books],
+        "titles": [book["title"] for book in books],
+        "authors": [book["author"] for book in books],
+        "years": [book["year"] for book in books],
+        "pages": [book["pages"] for book in books],
+    }
+    refreshed = await database.fetch_all(query=query, values=values)
+    if refreshed:
+        suggest_index.update(
+            (book["id"], book["title"], book["author"]) for book in refreshed
+        )
+        bump_catalogue_version()
+        await publish("books", [book["id"] for book in refreshed])
+    return refreshed
+
+
+# Links among book_links whose books still point at a full-size
+# /images_static cover instead of a thumbnail
+async def get_links_without_thumbnails(book_links: List[str], limit: int) -> List[str]:
+    if not book_links:
+        return []
+    query = """
+    SELECT book_link FROM books
+    WHERE book_link = ANY(:book_links) AND image_path LIKE '/images_static/%'
+    ORDER BY id
+    LIMIT :limit
+    """
+    rows = await database.fetch_all(
+        query=query, values={"book_links": book_links, "limit": limit}
+    )
+    return [row["book_link"] for row in rows]
+
+
+# Point books at their rendered thumbnails (one statement). A cover changed
+# through /books/update in the meantime is left alone.
+async def set_book_thumbnails(image_paths: dict[str, str]) -> List[dict[str, Any]]:
+    if not image_paths:
+        return []
+    query = """
+    UPDATE books
+    SET image_path = f.image_path
+    FROM unnest(CAST(:book_links AS text[]), CAST(:image_paths AS text[]))
+        AS f(book_link, image_path)
+    WHERE books.book_link = f.book_link AND books.image_path LIKE '/images_static/%'
+    RETURNING books.id
+    """
+    values = {
+        "book_links": list(image_paths),
+        "image_paths": list(image_paths.values()),
+    }
+    updated = await database.fetch_all(query=query, values=values)
+    if updated:
+        bump_catalogue_version()
+        await publish("books", [book["id"] for book in updated])
+    return updated
+
+
+# Delete the books whose files disappeared
+async def delete_books_by_links(book_links: List[str]) -> List[dict[str, Any]]:
+    if not book_links:
+        return []
+    query = "DELETE FROM books WHERE book_link = ANY(:book_links) RETURNING id"
+    deleted = await database.fetch_all(query=query, values={"book_links": book_links})
+    for book in deleted:
+        _book_link_cache.pop(book["id"], None)
+    if deleted:
+        suggest_index.update(removals=[book["id"] for book in deleted])
+        bump_catalogue_version()
+        await publish("books", [book["id"] for book in deleted])
+    return deleted
+
+
+# Build the in-memory autocomplete index from the books table
+async def load_suggest_index() -> None:
+    if not AUTOCOMPLETE_ENABLED:
+        return
+
+    async def fetch_rows():
+        rows = await database.fetch_all(query="SELECT id, title, author FROM books")
+        return [(row["id"], row["title"], row["author"]) for row in rows]
+
+    await suggest_index.load(fetch_rows)
+
+
+# Full rebuilds requested / covered so far; a burst of "everything changed"
+# notifications shares one rebuild instead of queueing one each
+_rebuild_lock = asyncio.Lock()
+_rebuilds_requested = 0
+_rebuilds_done = 0
+
+
+async def rebuild_suggest_index() -> None:
+    global _rebuilds_requested, _rebuilds_done
+    _rebuilds_requested += 1
+    wanted = _rebuilds_requested
+    async with _rebuild_lock:
+        if _rebuilds_done >= wanted:
+            return  # a rebuild that started after our request already ran
+        covers = _rebuilds_requested
+        await load_suggest_index()  # rows are read after every covered request
+        _rebuilds_done = covers
+
+
+# Another worker changed these books (None: all of them); drop this worker's copies
+async def evict_books(book_ids: Optional[List[int]]) -> None:
+    bump_catalogue_version()
+    if book_ids is None:
+        _book_link_cache.clear()
+        await rebuild_suggest_index()
+        return
+    for book_id in book_ids:
+        _book_link_cache.pop(book_id, None)
+    if not AUTOCOMPLETE_ENABLED:
+        return
+    query = "SELECT id, title, author FROM books WHERE id = ANY(:book_ids)"
+    rows = await database.fetch_all(query=query, values={"book_ids": book_ids})
+    suggest_index.update(
+        [(row["id"], row["title"], row["author"]) for row in rows],
+        removals=set(book_ids) - {row["id"] for row in rows},
+    )
+
+
+subscribe("books", evict_books)
+
+
+# Suggest books whose title/author (or a word of them) starts with prefix
+async def suggest_books(prefix: str, k: int = 10) -> list[dict[str, Any]]:
+    if suggest_index.loaded:
+        return suggest_index.suggest(prefix, k)
+    # Fallback when the in-process index is disabled: trigram-indexed prefix match.
+    # LIKE wildcards typed by the user are matched literally.
+    pattern = re.sub(r"([\\%_])", r"\\\1", prefix) + "%"
+    query = r"""
+    SELECT id, title, author
+    FROM books
+    WHERE title ILIKE :pattern ESCAPE '\' OR author ILIKE :pattern ESCAPE '\'
+    ORDER BY title, id
+    LIMIT :k
+    """
+    return await database.fetch_all(query=query, values={"pattern": pattern, "k": k})
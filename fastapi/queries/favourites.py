@@ -2,7 +2,7 @@
 # User-specific Favourites
 # -------------------
 from typing import Any, List
-from database import database
+from database import database, fetch_all_prepared, fetch_one_prepared
 
 
 async def add_favourite(user_id: int, book_id: int) -> None:
@@ -24,6 +24,34 @@ async def remove_all_favourites(user_id: int) -> None:
     await database.execute(query=query, values={"user_id": user_id})
 
 
+# Add many favourites in one statement; unknown book ids are skipped.
+# Returns the ids that were newly added.
+async def add_favourites_bulk(user_id: int, book_ids: List[int]) -> List[int]:
+    query = """
+    INSERT INTO favourites (user_id, book_id)
+    SELECT :user_id, b.id FROM books b WHERE b.id = ANY(:book_ids)
+    ON CONFLICT (user_id, book_id) DO NOTHING
+    RETURNING book_id
+    """
+    rows = await database.fetch_all(
+        query=query, values={"user_id": user_id, "book_ids": book_ids}
+    )
+    return [row["book_id"] for row in rows]
+
+
+# Remove many favourites in one statement; returns the ids that were removed
+async def remove_favourites_bulk(user_id: int, book_ids: List[int]) -> List[int]:
+    query = """
+    DELETE FROM favourites
+    WHERE user_id = :user_id AND book_id = ANY(:book_ids)
+    RETURNING book_id
+    """
+    rows = await database.fetch_all(
+        query=query, values={"user_id": user_id, "book_ids": book_ids}
+    )
+    return [row["book_id"] for row in rows]
+
+
 async def get_favourite_books(user_id: int) -> List[dict[str, Any]]:
     query = """
     SELECT b.id, b.title, b.author, b.image_path
@@ -32,17 +60,26 @@ async def get_favourite_books(user_id: int) -> List[dict[str, Any]]:
     WHERE f.user_id = :user_id
     ORDER BY f.book_id DESC
     """
-    return await database.fetch_all(query=query, values={"user_id": user_id})
+    return await fetch_all_prepared(query, {"user_id": user_id})
 
 
 async def is_favourite(user_id: int, book_id: int) -> bool:
     query = "SELECT 1 FROM favourites WHERE user_id = :user_id AND book_id = :book_id"
-    result = await database.fetch_one(
-        query=query, values={"user_id": user_id, "book_id": book_id}
-    )
+    result = await fetch_one_prepared(query, {"user_id": user_id, "book_id": book_id})
     return result is not None
 
 
+# Which of the given books are favourites (one indexed lookup for the lot)
+async def get_favourite_ids(user_id: int, book_ids: List[int]) -> List[int]:
+    query = """
+    SELECT book_id FROM favourites
+    WHERE user_id = :user_id AND book_id = ANY(:book_ids)
+    ORDER BY book_id
+    """
+    rows = await fetch_all_prepared(query, {"user_id": user_id, "book_ids": book_ids})
+    return [row["book_id"] for row in rows]
+
+
 #####
 
 # from typing import Any, Optional
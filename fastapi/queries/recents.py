@@ -2,28 +2,91 @@
 # User-specific Recents
 # -------------------
 
-from typing import Any, List
-from database import database
+import os
+from datetime import datetime
+from typing import Any, List, Optional
+from database import database, fetch_all_prepared
 
+# Opens kept per user; older ones are trimmed whenever the user's opens are written
+RECENTS_MAX_PER_USER = int(os.getenv("RECENTS_MAX_PER_USER", 100))
 
-async def add_recent(user_id: int, book_id: int) -> None:
+
+# Upsert many opens in one statement (arrays unnested server-side). Opens of
+# books or users deleted in the meantime are dropped; opened_at never moves back.
+async def add_recents_bulk(
+    user_ids: List[int], book_ids: List[int], opened_ats: List[datetime]
+) -> None:
     query = """
     INSERT INTO recents (user_id, book_id, opened_at)
-    VALUES (:user_id, :book_id, now())
-    ON CONFLICT (user_id, book_id) DO UPDATE SET opened_at = EXCLUDED.opened_at
+    SELECT v.user_id, v.book_id, v.opened_at
+    FROM unnest(
+        CAST(:user_ids AS int[]), CAST(:book_ids AS int[]),
+        CAST(:opened_ats AS timestamptz[])
+    ) AS v(user_id, book_id, opened_at)
+    JOIN books b ON b.id = v.book_id
+    JOIN users u ON u.id = v.user_id
+    ON CONFLICT (user_id, book_id)
+    DO UPDATE SET opened_at = GREATEST(recents.opened_at, EXCLUDED.opened_at)
     """
-    await database.execute(query=query, values={"user_id": user_id, "book_id": book_id})
+    values = {"user_ids": user_ids, "book_ids": book_ids, "opened_ats": opened_ats}
+    await database.execute(query=query, values=values)
+    await trim_recents(list(set(user_ids)))
+
+
+# Keep only the RECENTS_MAX_PER_USER newest opens of each given user. The
+# cutoff row is found through the (user_id, opened_at DESC) index, so the
+# cost doesn't grow with the user's history.
+async def trim_recents(user_ids: List[int]) -> None:
+    query = """
+    DELETE FROM recents r
+    USING (
+        SELECT u.user_id, cutoff.opened_at, cutoff.book_id
+        FROM unnest(CAST(:user_ids AS int[])) AS u(user_id)
+        CROSS JOIN LATERAL (
+            SELECT opened_at, book_id
+            FROM recents
+            WHERE user_id = u.user_id
+            ORDER BY opened_at DESC, book_id DESC
+            OFFSET :keep LIMIT 1
+        ) cutoff
+    ) c
+    WHERE r.user_id = c.user_id
+      AND (r.opened_at, r.book_id) <= (c.opened_at, c.book_id)
+    """
+    await database.execute(
+        query=query, values={"user_ids": user_ids, "keep": RECENTS_MAX_PER_USER}
+    )
+
+
+# One page of a user's recents, newest first, keyset-paginated on
+# (opened_at, book_id) along the (user_id, opened_at DESC) index
+async def get_recent_books(
+    user_id: int, after: Optional[tuple[datetime, int]] = None, limit: int = 50
+) -> List[dict[str, Any]]:
+    values: dict[str, Any] = {"user_id": user_id, "limit": limit}
+    keyset_clause = ""
+    if after is not None:
+        keyset_clause = "AND (r.opened_at, r.book_id) < (:after_opened_at, :after_id)"
+        values["after_opened_at"], values["after_id"] = after
+    query = f"""
+    SELECT b.id, b.title, b.author, b.image_path, r.opened_at
+    FROM recents r
+    JOIN books b ON b.id = r.book_id
+    WHERE r.user_id = :user_id {keyset_clause}
+    ORDER BY r.opened_at DESC, r.book_id DESC
+    LIMIT :limit
+    """
+    return await fetch_all_prepared(query, values)
 
 
-async def get_recent_books(user_id: int) -> List[dict[str, Any]]:
+# Book fields of a recents row, for opens still buffered in memory
+async def get_recent_book_rows(book_ids: List[int]) -> List[dict[str, Any]]:
     query = """
     SELECT b.id, b.title, b.author, b.image_path
     FROM books b
-    JOIN recents r ON b.id = r.book_id
-    WHERE r.user_id = :user_id
-    ORDER BY r.opened_at DESC
+    WHERE b.id = ANY(CAST(:book_ids AS int[]))
     """
-    return await database.fetch_all(query=query, values={"user_id": user_id})
+    return await fetch_all_prepared(query, {"book_ids": book_ids})
 
 
 async def delete_recent(user_id: int, book_id: int) -> None:
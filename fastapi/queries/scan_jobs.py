@@ -0,0 +1,112 @@
+# -------------------
+# Background scan jobs (shared by every worker through Postgres)
+# -------------------
+import json
+from typing import Any, Optional
+from database import database
+
+# Session advisory locks (SCAN_LOCK_CLASS, hashtext(folder)) are held by the
+# worker running a folder's scan and vanish with its connection
+SCAN_LOCK_CLASS = 7204
+
+
+# Start a job unless one is already running for the folder (returns None then)
+async def create_scan_job(folder: str) -> Optional[dict[str, Any]]:
+    query = """
+    INSERT INTO scan_jobs (folder, status)
+    VALUES (:folder, 'running')
+    ON CONFLICT (folder) WHERE status = 'running' DO NOTHING
+    RETURNING *
+    """
+    return await database.fetch_one(query=query, values={"folder": folder})
+
+
+async def get_scan_job(job_id: int) -> Optional[dict[str, Any]]:
+    query = "SELECT * FROM scan_jobs WHERE id = :job_id"
+    return await database.fetch_one(query=query, values={"job_id": job_id})
+
+
+async def get_running_scan_job(folder: str) -> Optional[dict[str, Any]]:
+    query = "SELECT * FROM scan_jobs WHERE folder = :folder AND status = 'running'"
+    return await database.fetch_one(query=query, values={"folder": folder})
+
+
+# Heartbeat: record progress so other workers can report it
+async def update_scan_job_progress(
+    job_id: int, total: int, processed: int, errors: int
+) -> None:
+    query = """
+    UPDATE scan_jobs
+    SET total = :total, processed = :processed, errors = :errors, updated_at = NOW()
+    WHERE id = :job_id AND status = 'running'
+    """
+    await database.execute(
+        query=query,
+        values={"job_id": job_id, "total": total, "processed": processed, "errors": errors},
+    )
+
+
+async def finish_scan_job(
+    job_id: int,
+    status: str,
+    total: int,
+    processed: int,
+    errors: int,
+    result: Optional[dict] = None,
+    error: Optional[str] = None,
+) -> None:
+    query = """
+    UPDATE scan_jobs
+    SET status = :status, total = :total, processed = :processed, errors = :errors,
+        result = CAST(:result AS jsonb), error = :error,
+        updated_at = NOW(), finished_at = NOW()
+    WHERE id = :job_id
+    """
+    values = {
+        "job_id": job_id,
+        "status": status,
+        "total": total,
+        "processed": processed,
+        "errors": errors,
+        "result": json.dumps(result) if result is not None else None,
+        "error": error,
+    }
+    await database.execute(query=query, values=values)
+
+
+# Jobs whose worker died stop heartbeating; release their folder. A job whose
+# folder lock is still held is alive however late its heartbeat is.
+async def fail_stale_scan_jobs(stale_seconds: int) -> None:
+    query = """
+    UPDATE scan_jobs
+    SET status = 'failed', error = 'Scan abandoned by its worker', finished_at = NOW()
+    WHERE status = 'running'
+      AND updated_at < NOW() - make_interval(secs => :stale_seconds)
+      AND NOT EXISTS (
+          SELECT 1 FROM pg_locks l
+          WHERE l.locktype = 'advisory'
+            AND l.database = (SELECT oid FROM pg_database WHERE datname = current_database())
+            AND l.classid = CAST(:lock_class AS int)::oid
+            AND l.objid = hashtext(scan_jobs.folder)::oid
+            AND l.objsubid = 2
+      )
+    """
+    await database.execute(
+        query=query,
+        values={"stale_seconds": stale_seconds, "lock_class": SCAN_LOCK_CLASS},
+    )
+
+
+# Take the folder's scan lock on the current connection (False if held elsewhere)
+async def try_lock_scan_folder(folder: str) -> bool:
+    query = "SELECT pg_try_advisory_lock(:lock_class, hashtext(:folder))"
+    return await database.fetch_val(
+        query=query, values={"lock_class": SCAN_LOCK_CLASS, "folder": folder}
+    )
+
+
+async def unlock_scan_folder(folder: str) -> None:
+    query = "SELECT pg_advisory_unlock(:lock_class, hashtext(:folder))"
+    await database.execute(
+        query=query, values={"lock_class": SCAN_LOCK_CLASS, "folder": folder}
+    )
@@ -1,6 +1,6 @@
 from typing import Any, Optional
 from database import database
-from auth.auth import hash_password
+from auth.auth import hash_password_async
 
 
 # Add a new user or return error if username/email already exists
@@ -16,7 +16,7 @@ async def add_user(username: str, email: str, password: str) -> dict[str, Any]:
     if result:
         return {"error": "Username or email already exists"}
 
-    hashed_password = hash_password(password)
+    hashed_password = await hash_password_async(password)
 
     query = """
     INSERT INTO users (username, email, password)
@@ -54,7 +54,7 @@ async def update_user(
         updates.append("email = :email")
         values["email"] = email
     if password is not None:
-        hashed_password = hash_password(password)
+        hashed_password = await hash_password_async(password)
         updates.append("password = :password")
         values["password"] = hashed_password
 
@@ -71,6 +71,14 @@ async def update_user(
     return await database.fetch_one(query=query, values=values)
 
 
+# Replace a password hash (rehash-on-login after a cost change)
+async def update_password_hash(user_id: int, hashed_password: str) -> None:
+    query = "UPDATE users SET password = :password WHERE id = :user_id"
+    await database.execute(
+        query=query, values={"user_id": user_id, "password": hashed_password}
+    )
+
+
 # Delete user by ID
 async def delete_user(user_id: int) -> Optional[dict[str, Any]]:
     query = "DELETE FROM users WHERE id = :user_id RETURNING id, username, email"
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from queries.recents import add_recents_bulk
+
+# Write-behind buffer for book opens. Repeated opens of the same (user, book)
+# collapse into the latest timestamp and go out as one multi-row upsert.
+RECENTS_FLUSH_INTERVAL = float(os.getenv("RECENTS_FLUSH_INTERVAL", 1.0))
+RECENTS_FLUSH_SIZE = int(os.getenv("RECENTS_FLUSH_SIZE", 500))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("RECENTS BUFFER")
+
+
+class RecentsBuffer:
+    """Pending opens per user, flushed every RECENTS_FLUSH_INTERVAL seconds,
+    as soon as RECENTS_FLUSH_SIZE pairs are waiting, and on shutdown.
+
+    Opens are write-behind: `add` returns at once. This worker's reads merge
+    `pending` (queued and in-flight opens) into what is stored, so a user sees
+    their own opens straight away; other workers see them after one interval.
+
+    A failed or cancelled flush puts its opens back in the queue, so the next
+    flush (at the latest the one in `stop`) retries them."""
+
+    def __init__(self) -> None:
+        self._pending: dict[int, dict[int, datetime]] = {}
+        self._size = 0
+        self._inflight: dict[int, dict[int, datetime]] = {}
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, user_id: int, book_id: int) -> None:
+        books = self._pending.setdefault(user_id, {})
+        if book_id not in books:
+            self._size += 1
+        books[book_id] = datetime.now(timezone.utc)
+        if self._size >= RECENTS_FLUSH_SIZE:
+            self._wake.set()
+
+    async def discard(self, user_id: int, book_id: Optional[int] = None) -> None:
+        # Called before deleting recents, so a later flush can't bring them
+        # back; the lock lets a flush already in flight land first
+        async with self._lock:
+            if book_id is None:
+                self._size -= len(self._pending.pop(user_id, {}))
+            elif self._pending.get(user_id, {}).pop(book_id, None) is not None:
+                self._size -= 1
+
+    def pending(self, user_id: int) -> dict[int, datetime]:
+        """book_id -> opened_at of this user's opens not yet stored."""
+        books = dict(self._inflight.get(user_id, {}))
+        books.update(self._pending.get(user_id, {}))
+        return books
+
+    async def flush(self) -> bool:
+        """Write pending opens. Never raises on a database error: False means
+        the write failed and the opens were requeued."""
+        async with self._lock:  # also waits out a flush already in flight
+            batch, self._pending, self._size = self._pending, {}, 0
+            entries = [
+                (user, book, opened_at)
+                for user, books in batch.items()
+                for book, opened_at in books.items()
+            ]
+            if not entries:
+                return True
+            user_ids, book_ids, opened_ats = map(list, zip(*entries))
+            self._inflight = batch
+            try:
+                await add_recents_bulk(user_ids, book_ids, opened_ats)
+            except asyncio.CancelledError:
+                self._requeue(batch)
+                raise
+            except Exception as e:
+                self._requeue(batch)
+                logger.error(f"Recents flush failed, {self._size} opens queued: {e}")
+                return False
+            finally:
+                self._inflight = {}
+            return True
+
+    def _requeue(self, batch: dict[int, dict[int, datetime]]) -> None:
+        # Keep failed opens for the next flush unless newer ones arrived
+        for user_id, books in batch.items():
+            pending = self._pending.setdefault(user_id, {})
+            for book_id, opened_at in books.items():
+                if book_id not in pending:
+                    pending[book_id] = opened_at
+                    self._size += 1
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # The loop's flush is shielded, so cancelling it leaves a write in
+        # flight to finish; the final flush waits for it on the lock
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if not await self.flush():
+            logger.error(f"Final recents flush failed, {self._size} opens lost")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), RECENTS_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await asyncio.shield(self.flush())
+
+
+recents_buffer = RecentsBuffer()
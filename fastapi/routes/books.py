@@ -1,14 +1,30 @@
-from fastapi import APIRouter, HTTPException, status, Body, Depends
+from fastapi import APIRouter, HTTPException, status, Body, Depends, Query, Request
 from fastapi.exceptions import RequestValidationError
 from typing import Optional
+import asyncio
+import json
 import logging
+import os
 from functools import wraps
 from pathlib import Path
+from urllib.parse import urlencode
 
 from models.books import *
 from queries.books import *
 from utilities import *
-from auth.auth import get_current_user
+from scan_jobs import start_scan_job
+from queries.scan_jobs import get_scan_job
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
+from auth.auth import (
+    get_current_user,
+    get_current_user_or_signed_url,
+    sign_file_access,
+)
+from file_delivery import PdfFileResponse
+from cache import cached_json_response, register_warmer
+from serialization import dump_json, model_fields, record_dicts
+from page_cache import PAGE_RANGE_MAX, open_page_window, prefetch_next_window
+from recents_buffer import recents_buffer
 
 router = APIRouter(tags=["Books"], prefix="/books")
 logging.basicConfig(level=logging.INFO)
@@ -39,13 +55,65 @@ def handle_route_errors(action: str):
     return decorator
 
 
-def format_book(row) -> dict:
-    return {
-        "id": row["id"],
-        "image_path": row["image_path"],
-        "title": row["title"],
-        "author": row["author"],
-    }
+BOOK_LIST_FIELDS = model_fields(BookListItem)
+
+
+def parse_cursor(cursor: Optional[str], sort: str):
+    try:
+        return decode_cursor(cursor, sort)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def book_page_response(data, sort: str, limit: int) -> bytes:
+    # BookListResponse as JSON, built straight from the records
+    rows, next_cursor = paginate(
+        data, limit, sort, key=lambda row: book_sort_value(row, sort)
+    )
+    return dump_json(
+        {"books": record_dicts(rows, BOOK_LIST_FIELDS), "next_cursor": next_cursor}
+    )
+
+
+async def list_books_page(sort: str, cursor: Optional[str], limit: int):
+    after = parse_cursor(cursor, sort)
+    data = await get_all_books(sort, after, limit + 1)
+    return book_page_response(data, sort, limit)
+
+
+async def search_books_page(q: str, cursor: Optional[str], limit: int):
+    after = parse_cursor(cursor, "rank")
+    data = await search_books(q, after, limit + 1)
+    return book_page_response(data, "rank", limit)
+
+
+async def title_books_page(title: str, sort: str, cursor: Optional[str], limit: int):
+    after = parse_cursor(cursor, sort)
+    data = await find_books_by_title(title, sort, after, limit + 1)
+    return book_page_response(data, sort, limit)
+
+
+async def author_books_page(author: str, sort: str, cursor: Optional[str], limit: int):
+    after = parse_cursor(cursor, sort)
+    data = await find_books_by_author(author, sort, after, limit + 1)
+    return book_page_response(data, sort, limit)
+
+
+def list_books_response(request: Optional[Request], sort: str, cursor, limit: int):
+    return cached_json_response(
+        request,
+        ("books", sort, cursor, limit),
+        lambda: list_books_page(sort, cursor, limit),
+    )
+
+
+async def warm_first_pages() -> None:
+    # First page of each sort order: what the home and catalogue views open with
+    for sort in BookSort.__args__:
+        await list_books_response(None, sort, None, DEFAULT_PAGE_SIZE)
+
+
+register_warmer(warm_first_pages)
 
 
 # ----------------------------
@@ -53,30 +121,98 @@ def format_book(row) -> dict:
 # ----------------------------
 @router.get("", response_model=BookListResponse)
 @handle_route_errors("Fetching all books")
-async def show_all_books_route(current_user: str = Depends(get_current_user)):
-    data = await get_all_books()
-    books = [format_book(row) for row in data]
-    return BookListResponse(books=[BookListItem(**book) for book in books])
+async def show_all_books_route(
+    request: Request,
+    sort: BookSort = "id",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: str = Depends(get_current_user),
+):
+    return await list_books_response(request, sort, cursor, limit)
 
 
 @router.get("/search", response_model=BookListResponse)
-@handle_route_errors("Searching books by title")
-async def filter_books_by_title_route(
-    title: Optional[str] = None, current_user: str = Depends(get_current_user)
+@handle_route_errors("Searching books")
+async def search_books_route(
+    request: Request,
+    q: Optional[str] = None,
+    title: Optional[str] = None,
+    sort: BookSort = "id",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: str = Depends(get_current_user),
 ):
-    data = await find_books_by_title(title) if title else await get_all_books()
-    books = [format_book(row) for row in data]
-    return BookListResponse(books=[BookListItem(**book) for book in books])
+    # `q` ranks matches across title and author; `title` is the plain filter
+    if q and q.strip():
+        q = q.strip()
+        return await cached_json_response(
+            request,
+            ("search", q, cursor, limit),
+            lambda: search_books_page(q, cursor, limit),
+        )
+    if title:
+        return await cached_json_response(
+            request,
+            ("title", title, sort, cursor, limit),
+            lambda: title_books_page(title, sort, cursor, limit),
+        )
+    return await list_books_response(request, sort, cursor, limit)
+
+
+@router.get("/suggest", response_model=BookSuggestResponse)
+@handle_route_errors("Suggesting books")
+async def suggest_books_route(
+    prefix: str = Query(..., min_length=1),
+    k: int = Query(10, ge=1, le=50),
+    current_user: str = Depends(get_current_user),
+):
+    suggestions = await suggest_books(prefix, k)
+    return BookSuggestResponse(
+        suggestions=[BookSuggestion(**book) for book in suggestions]
+    )
 
 
 @router.get("/filter", response_model=BookListResponse)
 @handle_route_errors("Filtering books by author")
 async def filter_books_by_author_route(
-    author: Optional[str] = None, current_user: str = Depends(get_current_user)
+    request: Request,
+    author: Optional[str] = None,
+    sort: BookSort = "id",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: str = Depends(get_current_user),
 ):
-    data = await find_books_by_author(author) if author else await get_all_books()
-    books = [format_book(row) for row in data]
-    return BookListResponse(books=[BookListItem(**book) for book in books])
+    if author:
+        return await cached_json_response(
+            request,
+            ("author", author, sort, cursor, limit),
+            lambda: author_books_page(author, sort, cursor, limit),
+        )
+    return await list_books_response(request, sort, cursor, limit)
+
+
+def format_scan_job(row) -> ScanJob:
+    last_seen = row["finished_at"] or row["updated_at"]
+    elapsed = (last_seen - row["started_at"]).total_seconds()
+    rate = row["processed"] / elapsed if elapsed > 0 else 0.0
+    eta = None
+    if row["status"] == "running" and rate > 0:
+        eta = round((row["total"] - row["processed"]) / rate, 1)
+    result = row["result"]
+    return ScanJob(
+        job_id=row["id"],
+        folder=row["folder"],
+        status=row["status"],
+        total=row["total"],
+        processed=row["processed"],
+        errors=row["errors"],
+        files_per_second=round(rate, 1),
+        eta_seconds=eta,
+        started_at=row["started_at"],
+        finished_at=row["finished_at"],
+        result=json.loads(result) if isinstance(result, str) else result,
+        error=row["error"],
+    )
 
 
 @router.get("/scan", response_model=BooksResponse)
@@ -84,18 +220,40 @@ async def filter_books_by_author_route(
 async def scan_books_route(
     folder: str = "/books", current_user: str = Depends(get_current_user)
 ):
-    scanned_books = await scan_books(folder)
-    if scanned_books is None:
-        logger.error(f"Failed to scan books in folder {folder}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to scan books",
-        )
+    # Scans run in the background; poll /books/scan/jobs/{job_id} for progress
+    job, created = await start_scan_job(folder)
+    message = "Scan started" if created else "Scan already in progress"
     return BooksResponse(
-        message=f"Scanned {scanned_books['added']} new books", books=scanned_books
+        message=f"{message} (job {job['id']})",
+        books={"job_id": job["id"], "status": job["status"]},
     )
 
 
+@router.post(
+    "/scan/jobs", response_model=ScanJobResponse, status_code=status.HTTP_202_ACCEPTED
+)
+@handle_route_errors("Starting scan job")
+async def start_scan_job_route(
+    folder: str = "/books", current_user: str = Depends(get_current_user)
+):
+    job, created = await start_scan_job(folder)
+    message = "Scan started" if created else "Scan already in progress"
+    return ScanJobResponse(message=message, job=format_scan_job(job))
+
+
+@router.get("/scan/jobs/{job_id}", response_model=ScanJobResponse)
+@handle_route_errors("Fetching scan job")
+async def get_scan_job_route(
+    job_id: int, current_user: str = Depends(get_current_user)
+):
+    job = await get_scan_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Scan job not found"
+        )
+    return ScanJobResponse(message=f"Scan {job['status']}", job=format_scan_job(job))
+
+
 @router.post("/update", response_model=BookResponse)
 @handle_route_errors("Updating book")
 async def update_book_route(
@@ -110,8 +268,9 @@ async def update_book_route(
         update.book_id, update.title, update.author, update.year, update.image_path
     )
 
-    # If metadata is provided, update the PDF
-    if update.book_link and any([update.title, update.author, update.year]):
+    # If metadata is provided, update the PDF. The file is the one catalogued
+    # for book_id; a client-supplied book_link is never trusted as a path.
+    if updated_book and any([update.title, update.author, update.year]):
         metadata = {}
         if update.title:
             metadata["/Title"] = update.title
@@ -120,7 +279,7 @@ async def update_book_route(
         if update.year:
             metadata["/Year"] = str(update.year)
         logger.info("Updating PDF metadata...")
-        await update_pdf_metadata(update.book_link, metadata)
+        await update_pdf_metadata(updated_book["book_link"], metadata)
 
     if not updated_book:
         logger.warning(
@@ -162,6 +321,116 @@ async def get_book_details_route(
     return BookDetailResponse(book_detail=BookOut(**book))
 
 
+@router.get("/{book_id}/view", response_model=BookViewResponse)
+@handle_route_errors("Fetching book view")
+async def get_book_view_route(
+    book_id: int,
+    record_open: bool = False,
+    current_user: str = Depends(get_current_user),
+):
+    # Book, favourite flag and note in one query. Opens are recorded by the
+    # Read button's POST /recents; record_open=true records one here instead
+    user_id = int(current_user)
+    book = await get_book_view(book_id, user_id)
+    if not book:
+        logger.warning(f"Book with ID {book_id} not found")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
+        )
+    if record_open:
+        recents_buffer.add(user_id, book_id)
+    return BookViewResponse(
+        book_detail=BookOut(**book), is_favourite=book["is_favourite"], note=book["note"]
+    )
+
+
+@router.get("/{book_id}/file_url", response_model=BookFileUrlResponse)
+@handle_route_errors("Signing book file URL")
+async def get_book_file_url_route(
+    book_id: int, current_user: str = Depends(get_current_user)
+):
+    # Short-lived URL for viewers that can't send the Authorization header
+    if not await get_book_link(book_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
+        )
+    params = sign_file_access(book_id, current_user)
+    return BookFileUrlResponse(
+        url=f"{router.prefix}/{book_id}/file?{urlencode(params)}",
+        expires_at=params["expires"],
+    )
+
+
+@router.api_route("/{book_id}/file", methods=["GET", "HEAD"])
+@handle_route_errors("Serving book file")
+async def get_book_file_route(
+    book_id: int,
+    request: Request,
+    current_user: str = Depends(get_current_user_or_signed_url),
+):
+    book_link = await get_book_link(book_id)
+    if not book_link:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
+        )
+    try:
+        path = book_file_path(book_link)
+        stat = await asyncio.to_thread(os.stat, path)
+    except (FileNotFoundError, ValueError):
+        logger.warning(f"File for book {book_id} is missing: {book_link}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book file not found"
+        )
+    return PdfFileResponse(str(path), stat, request.headers, filename=path.name)
+
+
+@router.get("/{book_id}/pages")
+@handle_route_errors("Serving book pages")
+async def get_book_pages_route(
+    book_id: int,
+    request: Request,
+    first: int = Query(..., alias="from", ge=1),
+    last: int = Query(..., alias="to", ge=1),
+    current_user: str = Depends(get_current_user_or_signed_url),
+):
+    if last < first or last - first + 1 > PAGE_RANGE_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Page range must be ascending and at most {PAGE_RANGE_MAX} pages",
+        )
+    book = await get_book_by_id(book_id)
+    if not book:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
+        )
+    if book["pages"] and first > book["pages"]:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail=f"Book has only {book['pages']} pages",
+        )
+    last = min(last, book["pages"]) if book["pages"] else last
+    try:
+        source = book_file_path(book["book_link"])
+        window, stat = await open_page_window(source, first, last)
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Book file not found"
+        )
+    except IndexError as e:
+        # The stored page count was stale and the file is shorter
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail=str(e)
+        )
+    prefetch_next_window(source, first, last, book["pages"] or 0)
+    return PdfFileResponse(
+        window.name,
+        stat,
+        request.headers,
+        filename=f"{source.stem}_{first}-{last}.pdf",
+        file=window,
+    )
+
+
 @router.delete("/remove/{book_id}", response_model=BookResponse)
 @handle_route_errors("Deleting book")
 async def remove_book_route(
@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.exceptions import RequestValidationError
 import logging
 from functools import wraps
+from typing import List
 
 from queries.favourites import *
 from models.favourites import *
 from auth.auth import get_current_user
+from serialization import json_list_response, model_fields
 
 router = APIRouter(tags=["Favourites"], prefix="/favourites")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("FAVOURITES ROUTE")
 
+FAVOURITE_BOOK_FIELDS = model_fields(FavouriteBookListItem)
+
 
 # ----------------------------
 # Error handling decorator
@@ -55,13 +59,43 @@ async def add_favourite_route(
 @handle_route_errors("Fetching favourite books")
 async def get_favourite_books_route(current_user: str = Depends(get_current_user)):
     books = await get_favourite_books(int(current_user))
-    return FavouriteBookListResponse(
-        favourite_books=(
-            [FavouriteBookListItem(**book) for book in books] if books else []
-        )
+    return json_list_response("favourite_books", books, FAVOURITE_BOOK_FIELDS)
+
+
+# Batch routes are declared before the /{book_id} ones so their paths win
+@router.post("/batch", response_model=FavouriteBatchResponse)
+@handle_route_errors("Adding favourite books")
+async def add_favourites_batch_route(
+    batch: FavouriteBatch, current_user: str = Depends(get_current_user)
+):
+    added = await add_favourites_bulk(int(current_user), batch.book_ids)
+    return FavouriteBatchResponse(
+        message=f"{len(added)} book(s) added to favourites.", book_ids=added
     )
 
 
+@router.delete("/batch", response_model=FavouriteBatchResponse)
+@handle_route_errors("Removing favourite books")
+async def remove_favourites_batch_route(
+    batch: FavouriteBatch, current_user: str = Depends(get_current_user)
+):
+    removed = await remove_favourites_bulk(int(current_user), batch.book_ids)
+    return FavouriteBatchResponse(
+        message=f"{len(removed)} book(s) removed from favourites.", book_ids=removed
+    )
+
+
+@router.get("/status", response_model=FavouriteStatusResponse)
+@handle_route_errors("Checking favourite books")
+async def favourite_status_route(
+    book_ids: List[int] = Query(..., max_length=MAX_BATCH_SIZE),
+    current_user: str = Depends(get_current_user),
+):
+    # Heart state for a whole card grid: pass ?book_ids=1&book_ids=2...
+    favourite_ids = await get_favourite_ids(int(current_user), book_ids)
+    return FavouriteStatusResponse(favourite_ids=favourite_ids)
+
+
 @router.delete("", response_model=FavouriteResponse)
 @handle_route_errors("Removing all favourite books")
 async def remove_all_favourites_route(current_user: str = Depends(get_current_user)):
@@ -1,15 +1,53 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import ORJSONResponse
+from datetime import datetime, timezone
+from typing import Any, Optional
 import logging
 from functools import wraps
 
 from queries.recents import *
 from models.recents import *
 from auth.auth import get_current_user
+from serialization import model_fields, record_dicts
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
+from recents_buffer import recents_buffer
 
 router = APIRouter(tags=["Recents"], prefix="/recents")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("RECENTS ROUTE")
 
+RECENT_BOOK_FIELDS = model_fields(RecentBookListItem)
+
+
+async def merge_pending_opens(
+    rows: list[Any],
+    pending: dict[int, datetime],
+    after: Optional[tuple[datetime, int]],
+    count: int,
+) -> list[Any]:
+    """The first `count` recents after the cursor with this worker's buffered
+    opens merged in. A book's newer open wins; stored rows it replaces are
+    dropped on every page, so a book never shows twice."""
+    stored = {row["id"]: row["opened_at"] for row in rows}
+    rows = [
+        row
+        for row in rows
+        if row["id"] not in pending or row["opened_at"] > pending[row["id"]]
+    ]
+    if after is not None and after[0].tzinfo is None:
+        after = (after[0].replace(tzinfo=timezone.utc), after[1])
+    opens = {
+        book_id: opened_at
+        for book_id, opened_at in pending.items()
+        if opened_at >= stored.get(book_id, opened_at)
+        and (after is None or (opened_at, book_id) < after)
+    }
+    if opens:
+        books = await get_recent_book_rows(list(opens))
+        rows += [{**book, "opened_at": opens[book["id"]]} for book in books]
+    rows.sort(key=lambda row: (row["opened_at"], row["id"]), reverse=True)
+    return rows[:count]
+
 
 # ----------------------------
 # Error handling decorator
@@ -50,7 +88,7 @@ async def insert_recent_route(
     book: RecentBookAdd, current_user: str = Depends(get_current_user)
 ):
     logger.info(f"Adding book {book.book_id} to recents for user {current_user}")
-    await add_recent(int(current_user), book.book_id)
+    recents_buffer.add(int(current_user), book.book_id)
     return RecentBookResponse(
         message="Book has been added to recents or updated.", book_id=book.book_id
     )
@@ -58,12 +96,26 @@ async def insert_recent_route(
 
 @router.get("", response_model=RecentBookListResponse)
 @handle_route_errors("Fetching recent books")
-async def get_recents_route(current_user: str = Depends(get_current_user)):
-    books = await get_recent_books(int(current_user))
-    if not books:
-        return RecentBookListResponse(recent_books=[])
-    return RecentBookListResponse(
-        recent_books=[RecentBookListItem(**book) for book in books]
+async def get_recents_route(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: str = Depends(get_current_user),
+):
+    after = decode_cursor(cursor, "opened_at")  # ValueError -> 400
+    # Opens buffered on this worker aren't stored yet: read enough extra rows
+    # to cover the ones they replace, then merge them in
+    pending = recents_buffer.pending(int(current_user))
+    rows = await get_recent_books(int(current_user), after, limit + 1 + len(pending))
+    if pending:
+        rows = await merge_pending_opens(rows, pending, after, limit + 1)
+    books, next_cursor = paginate(
+        rows, limit, "opened_at", key=lambda row: row["opened_at"].isoformat()
+    )
+    return ORJSONResponse(
+        {
+            "recent_books": record_dicts(books, RECENT_BOOK_FIELDS),
+            "next_cursor": next_cursor,
+        }
     )
 
 
@@ -71,5 +123,6 @@ async def get_recents_route(current_user: str = Depends(get_current_user)):
 @handle_route_errors("Clearing recent books")
 async def clear_all_route(current_user: str = Depends(get_current_user)):
     logger.info(f"Clearing all recents for user {current_user}")
+    await recents_buffer.discard(int(current_user))
     await delete_all_recents(int(current_user))
     return RecentBookResponse(message="All recent books have been cleared.")
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.exceptions import RequestValidationError
+import logging
+from functools import wraps
+
+from models.stats import *
+from database import pool_stats
+from compression import compression_budget
+from auth.auth import get_current_user
+
+router = APIRouter(tags=["Stats"], prefix="/stats")
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("STATS ROUTE")
+
+
+# ----------------------------
+# Error handling decorator
+# ----------------------------
+def handle_route_errors(action: str):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except (HTTPException, RequestValidationError) as e:
+                logger.error(f"{action} - Request/HTTP error: {e}")
+                raise
+            except Exception as e:
+                logger.error(f"{action} - Unexpected error: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Error while {action.lower()}.",
+                )
+
+        return wrapper
+
+    return decorator
+
+
+# ----------------------------
+# Routes
+# ----------------------------
+@router.get("", response_model=StatsResponse)
+@handle_route_errors("Fetching stats")
+async def get_stats_route(current_user: str = Depends(get_current_user)):
+    # Per worker: each uvicorn worker has its own pool and compression budget
+    return StatsResponse(
+        pool=PoolStats(**pool_stats()),
+        compression=CompressionStats(**compression_budget.stats()),
+    )
@@ -5,7 +5,11 @@ import logging
 from queries.users import *
 from models.users import *
 
-from auth.auth import verify_password, create_access_token, get_current_user
+from auth.auth import (
+    verify_and_update_password,
+    create_access_token,
+    get_current_user,
+)
 
 router = APIRouter(tags=["Users"])
 logging.basicConfig(level=logging.INFO)
@@ -35,11 +39,17 @@ async def signin_route(user: UserLogin):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
         )
-    if not verify_password(user.password, user_data["password"]):
+    valid, new_hash = await verify_and_update_password(
+        user.password, user_data["password"]
+    )
+    if not valid:
         logger.warning("Invalid credentials")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
         )
+    if new_hash:
+        logger.info(f"Upgrading password hash for {user_data['id']}")
+        await update_password_hash(user_data["id"], new_hash)
     access_token = create_access_token(
         data={"sub": str(user_data["id"])}, remember_me=user.remember_me
     )
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Any, Iterable
+
+from queries.scan_jobs import (
+    create_scan_job,
+    fail_stale_scan_jobs,
+    finish_scan_job,
+    get_running_scan_job,
+    try_lock_scan_folder,
+    unlock_scan_folder,
+    update_scan_job_progress,
+)
+from cache import warm_catalogue_cache
+from database import database
+from utilities import ScanProgress, scan_books
+
+# Running jobs heartbeat every SCAN_JOB_HEARTBEAT seconds; a job silent for
+# SCAN_JOB_STALE_SECONDS is assumed dead (e.g. its worker restarted)
+SCAN_JOB_HEARTBEAT = float(os.getenv("SCAN_JOB_HEARTBEAT", 1.0))
+SCAN_JOB_STALE_SECONDS = int(os.getenv("SCAN_JOB_STALE_SECONDS", 60))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("SCAN JOBS")
+
+_tasks: set[asyncio.Task] = set()
+
+
+async def start_scan_job(
+    folder: str, seen_deleted: Iterable[str] = ()
+) -> tuple[dict[str, Any], bool]:
+    """Start a background scan; returns (job, created). Only one scan per
+    folder runs at a time across all workers, so a retry joins the running job.
+    seen_deleted is passed on to scan_books."""
+    folder = str(Path(folder))
+    await fail_stale_scan_jobs(SCAN_JOB_STALE_SECONDS)
+    job = await create_scan_job(folder)
+    if job is None:
+        running = await get_running_scan_job(folder)
+        if running is not None:
+            return running, False
+        # The running job finished between the two queries; try once more
+        job = await create_scan_job(folder)
+        if job is None:
+            return await get_running_scan_job(folder), False
+
+    task = asyncio.create_task(_run_scan_job(job["id"], folder, list(seen_deleted)))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job, True
+
+
+async def _report_progress(job_id: int, progress: ScanProgress) -> None:
+    while True:
+        await asyncio.sleep(SCAN_JOB_HEARTBEAT)
+        try:
+            await update_scan_job_progress(
+                job_id, progress.total, progress.processed, progress.errors
+            )
+        except Exception as e:
+            logger.warning(f"Scan job {job_id} heartbeat failed: {e}")
+
+
+async def _run_scan_job(job_id: int, folder: str, seen_deleted: list[str]) -> None:
+    # The job's queries share one connection holding the folder's session
+    # lock, so a job wrongly declared stale can't be joined by a second scan
+    async with database.connection():
+        if not await try_lock_scan_folder(folder):
+            logger.warning(f"Scan job {job_id}: {folder} is locked by another scan")
+            await finish_scan_job(
+                job_id, "failed", 0, 0, 0, error="Another scan holds this folder"
+            )
+            return
+        try:
+            await _scan_locked(job_id, folder, seen_deleted)
+        finally:
+            await unlock_scan_folder(folder)
+
+
+async def _scan_locked(job_id: int, folder: str, seen_deleted: list[str]) -> None:
+    progress = ScanProgress()
+    heartbeat = asyncio.create_task(_report_progress(job_id, progress))
+    status, result, error = "failed", None, None
+    try:
+        result = await scan_books(folder, progress, seen_deleted)
+        status = "completed"
+        logger.info(f"Scan job {job_id} completed: {result['added']} added")
+    except asyncio.CancelledError:
+        error = "Scan interrupted by shutdown"
+        raise
+    except Exception as e:
+        error = str(e)
+        logger.error(f"Scan job {job_id} failed: {e}")
+    finally:
+        heartbeat.cancel()
+        await finish_scan_job(
+            job_id,
+            status,
+            progress.total,
+            progress.processed,
+            progress.errors,
+            result=result,
+            error=error,
+        )
+    if status == "completed":
+        # The scan bumped the catalogue version; rebuild the first pages now
+        await warm_catalogue_cache()
+
+
+async def cancel_scan_jobs() -> None:
+    for task in list(_tasks):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
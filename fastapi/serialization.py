@@ -0,0 +1,34 @@
+from typing import Any, Iterable
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+# -------------------
+# Fast list serialization
+# -------------------
+# List endpoints go straight from database records to JSON bytes: one dict per
+# row holding only the response model's fields, encoded by orjson. Routes still
+# declare `response_model` for the OpenAPI schema, but return a ready Response,
+# so FastAPI neither builds models nor revalidates the payload.
+
+
+def model_fields(model: type[BaseModel]) -> tuple[str, ...]:
+    # Field order of the declared item model, so schema and payload can't drift
+    return tuple(model.model_fields)
+
+
+def record_dicts(rows: Iterable[Any], fields: tuple[str, ...]) -> list[dict[str, Any]]:
+    # databases' Record wraps the asyncpg record in `_mapping`; read it directly
+    return [
+        {field: mapping[field] for field in fields}
+        for mapping in (getattr(row, "_mapping", row) for row in rows)
+    ]
+
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(content)
+
+
+def json_list_response(key: str, rows: Iterable[Any], fields: tuple[str, ...]) -> ORJSONResponse:
+    return ORJSONResponse({key: record_dicts(rows, fields)})
@@ -0,0 +1,88 @@
+# Cover thumbnails. Kept free of database/app imports so process-pool
+# workers spawned during ingestion start quickly.
+from io import BytesIO
+from pathlib import Path
+import hashlib
+import os
+
+from PIL import Image
+from pypdf import PdfReader
+from starlette.staticfiles import StaticFiles
+
+IMAGES_FOLDER = "/images"
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", "/images/thumbnails")
+THUMBNAIL_WIDTHS = tuple(
+    int(width) for width in os.getenv("THUMBNAIL_WIDTHS", "160,320,640").split(",")
+)
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "webp").lower()  # webp or jpeg
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", 80))
+# Width the catalogue's image_path points at; other widths share the same name
+DEFAULT_THUMBNAIL_WIDTH = int(os.getenv("DEFAULT_THUMBNAIL_WIDTH", 320))
+
+
+def thumbnail_name(digest: str, width: int) -> str:
+    ext = "jpg" if THUMBNAIL_FORMAT == "jpeg" else THUMBNAIL_FORMAT
+    return f"{digest[:2]}/{digest}_{width}.{ext}"
+
+
+def thumbnail_url(digest: str, width: int = DEFAULT_THUMBNAIL_WIDTH) -> str:
+    return f"/thumbnails/{thumbnail_name(digest, width)}"
+
+
+def _cover_source(pdf_path: Path) -> bytes:
+    # Prefer the hand-picked /images/<stem>.jpg, else the largest image
+    # embedded in the PDF's first page
+    jpg_path = Path(IMAGES_FOLDER) / f"{pdf_path.stem}.jpg"
+    if jpg_path.is_file():
+        return jpg_path.read_bytes()
+    reader = PdfReader(pdf_path)
+    images = reader.pages[0].images if len(reader.pages) else []
+    if not images:
+        raise ValueError("No cover image found")
+    largest = max(images, key=lambda image: len(image.data))
+    return largest.data
+
+
+def make_cover_thumbnails(pdf_path: Path) -> dict:
+    """Render every thumbnail width of a book's cover into the on-disk cache.
+
+    Files are named by the SHA-256 of the source image, so identical covers
+    share one set of variants and a cached file never changes. Returns
+    {"File", "Digest"} or {"File", "Error"}, like the metadata readers.
+    """
+    try:
+        source = _cover_source(pdf_path)
+        digest = hashlib.sha256(source).hexdigest()
+        cache_dir = Path(THUMBNAIL_CACHE_DIR)
+        pending = [
+            width
+            for width in THUMBNAIL_WIDTHS
+            if not (cache_dir / thumbnail_name(digest, width)).exists()
+        ]
+        if pending:
+            with Image.open(BytesIO(source)) as image:
+                cover = image.convert("RGB")
+            for width in pending:
+                target = cache_dir / thumbnail_name(digest, width)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                # Never upscale: small covers keep their own width
+                size = min(width, cover.width)
+                height = max(1, round(cover.height * size / cover.width))
+                variant = cover.resize((size, height), Image.Resampling.LANCZOS)
+                tmp_path = target.with_suffix(f".{os.getpid()}.tmp")
+                variant.save(
+                    tmp_path, format=THUMBNAIL_FORMAT.upper(), quality=THUMBNAIL_QUALITY
+                )
+                os.replace(tmp_path, target)
+        return {"File": pdf_path.name, "Digest": digest}
+    except Exception as e:
+        return {"File": pdf_path.name, "Error": str(e)}
+
+
+class ThumbnailFiles(StaticFiles):
+    # Content-addressed files never change, so let clients keep them forever
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
@@ -1,57 +1,191 @@
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
 import asyncio
-from pypdf import PdfReader, PdfWriter
+import logging
+import multiprocessing
+import os
+import time
+from typing import Callable, Iterable, Iterator, Optional
 
-from queries.books import add_books_bulk, book_exists
+from pdf_metadata import (
+    extract_year_from_creation_date,
+    read_pdf_metadata,
+    safe_str,
+    write_pdf_metadata,
+)
+from thumbnails import make_cover_thumbnails, thumbnail_url
+from queries.books import (
+    add_books_bulk,
+    delete_books_by_links,
+    get_book_ids_by_links,
+    get_links_without_thumbnails,
+    refresh_books_from_files,
+    set_book_thumbnails,
+)
+from queries.book_files import (
+    delete_file_fingerprints,
+    get_file_fingerprints,
+    upsert_file_fingerprints,
+)
 
+# Metadata and cover rendering: SCAN_WORKERS > 1 runs them in a process pool
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", os.cpu_count() or 1))
+SCAN_CHUNK_SIZE = int(os.getenv("SCAN_CHUNK_SIZE", 16))
+# Catalogued books still on full-size covers get thumbnails, this many per scan
+THUMBNAIL_BACKFILL_BATCH = int(os.getenv("THUMBNAIL_BACKFILL_BATCH", 500))
+PDF_PATTERN = "*.pdf*"
+BOOKS_FOLDER = "/books"
 
-def extract_year_from_creation_date(metadata):
-    creation_date = metadata.get("/CreationDate")
-    if (
-        creation_date and len(creation_date) >= 6 and creation_date.startswith("D:")
-    ):  # creation_date looks like "D:YYYYMMDDHHmmSS"
-        return int(creation_date[2:6])  # extract YYYY as int
-    return 0
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("UTILITIES")
 
 
-def extract_pdf_metadata(folder: str) -> list:
-    folder_path = Path(folder)
+class ScanProgress:
+    # Counters written by the extraction thread, read by the job heartbeat
+    def __init__(self) -> None:
+        self.total = 0
+        self.processed = 0
+        self.errors = 0
+
+
+def stat_pdf_files(folder: str) -> dict[str, tuple[int, int, int]]:
+    # Fingerprint every PDF with stat calls only: path -> (size, mtime_ns, inode)
+    fingerprints = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and fnmatch(entry.name, PDF_PATTERN):
+                stat = entry.stat()
+                fingerprints[entry.path] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+    return fingerprints
+
+
+def scan_pool(workers: int = SCAN_WORKERS) -> Optional[ProcessPoolExecutor]:
+    # One spawn pool per scan, shared by metadata extraction and thumbnails.
+    # Processes start on first use, so a scan with nothing to parse spawns none
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def run_in_pool(
+    fn: Callable,
+    items: list,
+    pool: Optional[ProcessPoolExecutor] = None,
+    chunk_size: int = SCAN_CHUNK_SIZE,
+) -> Iterator:
+    # CPU-bound per-file work: spread chunks of files across the pool
+    if pool is not None and len(items) > chunk_size:
+        yield from pool.map(fn, items, chunksize=chunk_size)
+    else:
+        yield from map(fn, items)
+
+
+def extract_files_metadata(
+    files: list[Path],
+    pool: Optional[ProcessPoolExecutor] = None,
+    chunk_size: int = SCAN_CHUNK_SIZE,
+    progress: Optional[ScanProgress] = None,
+) -> list:
+    progress = progress or ScanProgress()
+    progress.total = len(files)
+    started = time.perf_counter()
     all_metadata = []
-    for file in folder_path.glob("*.pdf*"):
-        try:
-            reader = PdfReader(file)
-            metadata = reader.metadata or {}
-            year = extract_year_from_creation_date(metadata)
-            num_pages = len(reader.pages)
-            file_info = {
-                "File": file.name,
-                "Title": metadata.get("/Title", "Unknown Title"),
-                "Author": metadata.get("/Author", "Unknown"),
-                "Year": year,
-                "Pages": num_pages,
-            }
-            file_info.update(metadata)
-            all_metadata.append(file_info)
-        except Exception as e:
-            all_metadata.append({"File": file.name, "Error": str(e)})
+    for file_info in run_in_pool(read_pdf_metadata, files, pool, chunk_size):
+        all_metadata.append(file_info)
+        progress.processed += 1
+        if "Error" in file_info:
+            progress.errors += 1
+    elapsed = time.perf_counter() - started
+    rate = len(files) / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Extracted metadata from {len(files)} files in {elapsed:.2f}s "
+        f"({rate:.1f} files/s, {'process pool' if pool else 'in process'})"
+    )
     return all_metadata
 
 
-def safe_str(val):
-    if isinstance(val, bytes):
-        val = val.decode("utf-8", errors="ignore")
-    return str(val).replace("\x00", "")
+def make_thumbnails(
+    files: list[Path], pool: Optional[ProcessPoolExecutor] = None
+) -> dict[str, str]:
+    # file name -> cover digest, for the files whose cover could be rendered
+    digests = {}
+    for result in run_in_pool(make_cover_thumbnails, files, pool):
+        if "Error" in result:
+            logger.warning(f"No thumbnail for {result['File']}: {result['Error']}")
+        else:
+            digests[result["File"]] = result["Digest"]
+    return digests
+
+
+def extract_pdf_metadata(
+    folder: str, workers: int = SCAN_WORKERS, chunk_size: int = SCAN_CHUNK_SIZE
+) -> list:
+    files = sorted(Path(folder).glob(PDF_PATTERN))
+    pool = scan_pool(workers)
+    try:
+        return extract_files_metadata(files, pool, chunk_size)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def book_link_for(file_name: str) -> str:
+    return f"/books_static/{file_name}"
+
+
+async def scan_books(
+    folder: str,
+    progress: Optional[ScanProgress] = None,
+    seen_deleted: Iterable[str] = (),
+) -> dict:
+    # seen_deleted: paths whose deletion was observed (by the watcher), which
+    # may be removed even when the folder now looks empty
+    pool = scan_pool()
+    try:
+        return await _scan_books(str(Path(folder)), progress, seen_deleted, pool)
+    finally:
+        if pool is not None:
+            await asyncio.to_thread(pool.shutdown)
+
+
+async def _scan_books(
+    folder: str,
+    progress: Optional[ScanProgress],
+    seen_deleted: Iterable[str],
+    pool: Optional[ProcessPoolExecutor],
+) -> dict:
+    started = time.perf_counter()
 
+    # Only files that are new or whose fingerprint changed get opened
+    on_disk = await asyncio.to_thread(stat_pdf_files, folder)
+    known = await get_file_fingerprints(folder)
+    changed = sorted(path for path, fp in on_disk.items() if known.get(path) != fp)
+    removed_paths = [path for path in known if path not in on_disk]
+    data = await asyncio.to_thread(
+        extract_files_metadata,
+        [Path(path) for path in changed],
+        pool,
+        progress=progress,
+    )
+    elapsed = time.perf_counter() - started
 
-async def scan_books(folder: str) -> dict:
-    folder_path = Path(folder)
-    data = await asyncio.to_thread(extract_pdf_metadata, str(folder_path))
     books_to_add = []
+    books_to_refresh = []
     errors = []
-    skipped = []
+    changed_paths = set(changed)
+    skipped = [Path(path).name for path in on_disk if path not in changed_paths]
+    updated = []
+    scanned_links = {}
+    parsed = []
+
+    failed_paths = []
 
     for data_item in data:
         if "Error" in data_item:
+            failed_paths.append(os.path.join(folder, data_item.get("File", "")))
             errors.append(
                 {
                     "file": safe_str(data_item.get("File", "Unknown file")),
@@ -59,48 +193,157 @@ async def scan_books(folder: str) -> dict:
                 }
             )
         else:
-            file_name = safe_str(data_item.get("File"))
-            book_link = f"/books_static/{file_name}"
-            if not await book_exists(book_link):
-                books_to_add.append(
-                    {
-                        "title": safe_str(data_item.get("/Title", "Unknown Title")),
-                        "author": safe_str(data_item.get("Author", "Unknown Author")),
-                        "year": data_item.get("Year", 0),
-                        "pages": data_item.get("Pages", 0),
-                        "book_link": book_link,
-                        "image_path": f"/images_static/{Path(file_name).stem}.jpg",
-                    }
-                )
-            else:
-                skipped.append(file_name)
+            path = os.path.join(folder, data_item["File"])
+            scanned_links[path] = book_link_for(safe_str(data_item["File"]))
+            parsed.append((path, data_item))
+
+    # One lookup for the whole batch instead of a query per file
+    catalogued = await get_book_ids_by_links(list(scanned_links.values()))
+
+    for path, data_item in parsed:
+        file_name = safe_str(data_item.get("File"))
+        book_link = scanned_links[path]
+        if book_link not in catalogued:
+            books_to_add.append(
+                {
+                    "title": safe_str(data_item.get("/Title", "Unknown Title")),
+                    "author": safe_str(data_item.get("Author", "Unknown Author")),
+                    "year": data_item.get("Year", 0),
+                    "pages": data_item.get("Pages", 0),
+                    "book_link": book_link,
+                    "image_path": f"/images_static/{Path(file_name).stem}.jpg",
+                }
+            )
+        elif path in known:
+            # File changed since the last scan: refresh what it carries
+            books_to_refresh.append(
+                {
+                    "book_link": book_link,
+                    "title": safe_str(data_item.get("/Title", "Unknown Title")),
+                    "author": safe_str(data_item.get("Author", "Unknown Author")),
+                    "year": data_item.get("Year", 0),
+                    "pages": data_item.get("Pages", 0),
+                }
+            )
+            updated.append(file_name)
+        else:
+            skipped.append(file_name)
+
+    await refresh_books_from_files(books_to_refresh)
+
+    # Books catalogued before thumbnails existed (or whose cover couldn't be
+    # rendered yet) still point at full-size covers; catch up on a batch
+    backfill = await get_links_without_thumbnails(
+        [book_link_for(Path(path).name) for path in on_disk], THUMBNAIL_BACKFILL_BATCH
+    )
+    cover_links = [book["book_link"] for book in books_to_add] + backfill
+    digests = {}
+    if cover_links:
+        # Covers are rendered before insert so rows point at their thumbnails
+        digests = await asyncio.to_thread(
+            make_thumbnails,
+            [Path(folder) / Path(book_link).name for book_link in cover_links],
+            pool,
+        )
+    for book in books_to_add:
+        digest = digests.get(Path(book["book_link"]).name)
+        if digest:
+            book["image_path"] = thumbnail_url(digest)
+    await set_book_thumbnails(
+        {
+            book_link: thumbnail_url(digests[Path(book_link).name])
+            for book_link in backfill
+            if Path(book_link).name in digests
+        }
+    )
 
     added_count = 0
     if books_to_add:
-        await add_books_bulk(books_to_add)
-        added_count = len(books_to_add)
+        # ON CONFLICT skips links a concurrent scan inserted meanwhile
+        added = await add_books_bulk(books_to_add)
+        added_count = len(added)
+        catalogued.update({book["book_link"]: book["id"] for book in added})
+
+    if added_count < len(books_to_add):
+        catalogued = await get_book_ids_by_links(list(scanned_links.values()))
+    # Unparseable files are fingerprinted too (without a book), so they are
+    # only retried once they change
+    book_ids = {
+        path: catalogued[book_link]
+        for path, book_link in scanned_links.items()
+        if book_link in catalogued
+    }
+    book_ids.update({path: None for path in failed_paths if path in on_disk})
+    await upsert_file_fingerprints(
+        [
+            {
+                "path": path,
+                "folder": folder,
+                "size": on_disk[path][0],
+                "mtime_ns": on_disk[path][1],
+                "inode": on_disk[path][2],
+                "book_id": book_id,
+            }
+            for path, book_id in book_ids.items()
+        ]
+    )
+
+    removed = []
+    if removed_paths and not on_disk:
+        # An empty folder is more likely an unmounted volume than a purge, so
+        # only deletions that were actually observed go through
+        seen_deleted = set(seen_deleted)
+        kept = len(removed_paths)
+        removed_paths = [path for path in removed_paths if path in seen_deleted]
+        if len(removed_paths) < kept:
+            logger.warning(
+                f"No PDFs found in {folder}; keeping "
+                f"{kept - len(removed_paths)} books not seen deleted"
+            )
+    if removed_paths:
+        removed = [Path(path).name for path in removed_paths]
+        await delete_books_by_links([book_link_for(name) for name in removed])
+        await delete_file_fingerprints(removed_paths)
+
+    return {
+        "added": added_count,
+        "updated": updated,
+        "removed": removed,
+        "skipped": skipped,
+        "errors": errors,
+        "files_per_second": round(len(data) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
 
-    return {"added": added_count, "skipped": skipped, "errors": errors}
+def book_file_path(book_link: str) -> Path:
+    # Links are served from the /books_static mount of the /books folder.
+    # Raises ValueError for links that resolve outside BOOKS_FOLDER.
+    books_folder = Path(BOOKS_FOLDER).resolve()
+    if book_link.startswith("/books_static/"):
+        path = books_folder / book_link[len("/books_static/") :]
+    else:
+        path = Path(book_link)
+    path = path.resolve()
+    if not path.is_relative_to(books_folder):
+        raise ValueError(f"Book link outside {BOOKS_FOLDER}: {book_link}")
+    return path
 
 
-async def update_pdf_metadata(book_path, metadata_dict) -> None:
+async def update_pdf_metadata(book_link, metadata_dict) -> None:
     def _update_pdf():
-        pdf_path_obj = Path(book_path)
+        try:
+            pdf_path_obj = book_file_path(str(book_link))
+        except ValueError as e:
+            logger.warning(f"Not updating PDF metadata: {e}")
+            return
         if not pdf_path_obj.exists():
-            print(f"File not found: {pdf_path_obj}")
+            logger.warning(f"File not found: {pdf_path_obj}")
             return
         try:
-            reader = PdfReader(pdf_path_obj)
-            writer = PdfWriter()
-            for page in reader.pages:
-                writer.add_page(page)
-            metadata = reader.metadata or {}
-            metadata.update(metadata_dict)
-            writer.add_metadata(metadata)
-            with open(pdf_path_obj, "wb") as f:
-                writer.write(f)
+            mode = write_pdf_metadata(pdf_path_obj, metadata_dict)
+            logger.info(f"Updated PDF metadata for {pdf_path_obj} ({mode})")
         except Exception as e:
-            print(f"Error updating PDF metadata for {pdf_path_obj}: {e}")
+            logger.error(f"Error updating PDF metadata for {pdf_path_obj}: {e}")
 
     await asyncio.to_thread(_update_pdf)
 
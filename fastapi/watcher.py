@@ -0,0 +1,201 @@
+import asyncio
+import ctypes
+import logging
+import os
+import struct
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Optional
+
+from database import database
+from scan_jobs import start_scan_job
+from utilities import PDF_PATTERN, stat_pdf_files
+
+# Live ingestion of the books folder (off unless BOOKS_WATCH_ENABLED=true)
+BOOKS_WATCH_ENABLED = os.getenv("BOOKS_WATCH_ENABLED", "false").lower() == "true"
+BOOKS_WATCH_FOLDER = os.getenv("BOOKS_WATCH_FOLDER", "/books")
+# Changes are batched until the folder has been quiet this long (seconds)...
+BOOKS_WATCH_DEBOUNCE = float(os.getenv("BOOKS_WATCH_DEBOUNCE", 2.0))
+# ...but a steady stream of changes is still flushed at least this often
+BOOKS_WATCH_MAX_DELAY = float(os.getenv("BOOKS_WATCH_MAX_DELAY", 30.0))
+# Stat-diff interval when inotify is unavailable (e.g. network mounts)
+BOOKS_WATCH_POLL_INTERVAL = float(os.getenv("BOOKS_WATCH_POLL_INTERVAL", 30.0))
+# Standby workers retry the watcher election this often (seconds)
+BOOKS_WATCH_ELECTION_INTERVAL = float(os.getenv("BOOKS_WATCH_ELECTION_INTERVAL", 15.0))
+# Advisory lock class of the watcher election, keyed by hashtext(folder)
+WATCH_LOCK_CLASS = 7205
+_TRY_LOCK = "SELECT pg_try_advisory_lock(:lock_class, hashtext(:folder))"
+_UNLOCK = "SELECT pg_advisory_unlock(:lock_class, hashtext(:folder))"
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+_EVENT_HEADER = struct.Struct("iIII")
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("WATCHER")
+
+
+def _inotify_watch(folder: str) -> Optional[int]:
+    """Return a non-blocking inotify fd watching folder, or None if unsupported."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+    if libc.inotify_add_watch(fd, os.fsencode(folder), mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class BooksWatcher:
+    """Turns filesystem changes in the books folder into batched incremental
+    scans. Each batch goes through scan_books (via a scan job), so new, changed,
+    moved and deleted PDFs take the same path as a manual rescan.
+
+    Every worker runs one, but only the worker holding the folder's session
+    advisory lock watches; the others retry the election until that worker
+    (or its connection) goes away."""
+
+    def __init__(self, folder: str) -> None:
+        self.folder = str(Path(folder))
+        self._fd: Optional[int] = None
+        self._tasks: list[asyncio.Task] = []
+        self._election: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        self._first_change = 0.0
+        self._last_change = 0.0
+        # Paths inotify saw deleted or moved away, not yet handed to a scan
+        self._deleted: set[str] = set()
+
+    async def start(self) -> None:
+        self._election = asyncio.create_task(self._elect())
+
+    async def stop(self) -> None:
+        if self._election is not None:
+            self._election.cancel()
+            await asyncio.gather(self._election, return_exceptions=True)
+            self._election = None
+
+    async def _elect(self) -> None:
+        lock = {"lock_class": WATCH_LOCK_CLASS, "folder": self.folder}
+        while True:
+            try:
+                async with database.connection() as connection:
+                    if await database.fetch_val(query=_TRY_LOCK, values=lock):
+                        raw = connection.raw_connection
+                        lost = asyncio.Event()
+                        raw.add_termination_listener(lambda _: lost.set())
+                        logger.info(f"Elected to watch {self.folder}")
+                        await self._watch()
+                        try:
+                            await lost.wait()
+                        finally:
+                            await self._unwatch()
+                            if not raw.is_closed():
+                                await database.execute(query=_UNLOCK, values=lock)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Watcher election for {self.folder} failed: {e}")
+            await asyncio.sleep(BOOKS_WATCH_ELECTION_INTERVAL)
+
+    async def _watch(self) -> None:
+        self._fd = _inotify_watch(self.folder)
+        if self._fd is not None:
+            asyncio.get_running_loop().add_reader(self._fd, self._read_events)
+            logger.info(f"Watching {self.folder} with inotify")
+        else:
+            self._tasks.append(asyncio.create_task(self._poll()))
+            logger.info(
+                f"inotify unavailable; polling {self.folder} "
+                f"every {BOOKS_WATCH_POLL_INTERVAL}s"
+            )
+        self._tasks.append(asyncio.create_task(self._flush_batches()))
+        # Changes made while no worker was watching
+        self._mark_changed()
+
+    async def _unwatch(self) -> None:
+        if self._fd is not None:
+            asyncio.get_running_loop().remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _mark_changed(self) -> None:
+        now = time.monotonic()
+        if not self._changed.is_set():
+            self._first_change = now
+        self._last_change = now
+        self._changed.set()
+
+    def _read_events(self) -> None:
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            start = offset + _EVENT_HEADER.size
+            name = data[start : start + length].rstrip(b"\0").decode(errors="ignore")
+            offset = start + length
+            if mask & IN_Q_OVERFLOW or fnmatch(name, PDF_PATTERN):
+                self._mark_changed()
+            if name and fnmatch(name, PDF_PATTERN):
+                path = os.path.join(self.folder, name)
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._deleted.add(path)
+                else:
+                    self._deleted.discard(path)
+
+    async def _poll(self) -> None:
+        snapshot = await asyncio.to_thread(stat_pdf_files, self.folder)
+        while True:
+            await asyncio.sleep(BOOKS_WATCH_POLL_INTERVAL)
+            current = await asyncio.to_thread(stat_pdf_files, self.folder)
+            if current != snapshot:
+                snapshot = current
+                self._mark_changed()
+
+    async def _flush_batches(self) -> None:
+        while True:
+            await self._changed.wait()
+            # Debounce: wait for a quiet period, bounded by the max delay
+            while True:
+                now = time.monotonic()
+                quiet_at = self._last_change + BOOKS_WATCH_DEBOUNCE
+                deadline = self._first_change + BOOKS_WATCH_MAX_DELAY
+                if now >= min(quiet_at, deadline):
+                    break
+                await asyncio.sleep(min(quiet_at, deadline) - now)
+            self._changed.clear()
+            deleted = set(self._deleted)
+            try:
+                job, created = await start_scan_job(self.folder, deleted)
+            except Exception as e:
+                logger.error(f"Live ingestion scan failed to start: {e}")
+                created = False
+            if not created:
+                # A scan is already running and may have missed these changes
+                self._mark_changed()
+                await asyncio.sleep(BOOKS_WATCH_DEBOUNCE)
+            else:
+                self._deleted -= deleted
+                logger.info(f"Live ingestion started scan job {job['id']}")
+
+
+books_watcher = BooksWatcher(BOOKS_WATCH_FOLDER)
@@ -26,12 +26,12 @@ const EditNoteForm = dynamic(() => import("@/components/EditNoteForm"), {
 
 const NOTE_PLACEHOLDER = "No note available";
 
-export default function BookDetail({ book }) {
+export default function BookDetail({ book, view }) {
   const apiUrl = `${process.env.NEXT_PUBLIC_API_URL}`;
 
   const [currentBook, setCurrentBook] = useState(book);
   const [books, setBooks] = useState([]);
-  const [favourite, setFavourite] = useState(false);
+  const [favourite, setFavourite] = useState(view?.isFavourite ?? false);
   const [favLoading, setFavLoading] = useState(false);
   const [summary, setSummary] = useState("");
   const [editOpen, setEditOpen] = useState(false);
@@ -85,12 +85,14 @@ export default function BookDetail({ book }) {
   const fetchBookSummary = useCallback(
     async (book) => {
       try {
-        const noteRes = await api.get(`/notes/${book.id}`).catch((err) => {
-          if (err.response?.status === 404) return { data: { note: "" } };
-          throw err;
-        });
-
-        let note = noteRes.data?.note ?? "";
+        let note = view?.note;
+        if (note === undefined) {
+          const noteRes = await api.get(`/notes/${book.id}`).catch((err) => {
+            if (err.response?.status === 404) return { data: { note: "" } };
+            throw err;
+          });
+          note = noteRes.data?.note ?? "";
+        }
         if (note.trim() !== "") {
           setSummary(note);
         } else {
@@ -133,7 +135,7 @@ export default function BookDetail({ book }) {
         setSummary(NOTE_PLACEHOLDER);
       }
     },
-    [debouncedUpsertNote]
+    [debouncedUpsertNote, view]
   );
 
   useEffect(() => {
@@ -145,7 +147,8 @@ export default function BookDetail({ book }) {
     const loadData = async () => {
       try {
         await Promise.all([
-          fetchFavouriteStatus(book.id),
+          // The /view response already carries the favourite flag
+          view ? null : fetchFavouriteStatus(book.id),
           fetchAuthorBooks(book.author, book.id),
           fetchBookSummary(book),
         ]);
@@ -157,7 +160,7 @@ export default function BookDetail({ book }) {
     };
 
     loadData();
-  }, [book, fetchFavouriteStatus, fetchAuthorBooks, fetchBookSummary]);
+  }, [book, view, fetchFavouriteStatus, fetchAuthorBooks, fetchBookSummary]);
 
   // Lazy load toggleFavourite only when needed
   const handleFavouriteClick = useCallback(async () => {
@@ -14,6 +14,7 @@ export default function BookDetailPage() {
   const id = params.id;
 
   const [book, setBook] = useState(null);
+  const [view, setView] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -22,8 +23,13 @@ export default function BookDetailPage() {
       setLoading(true);
       try {
         await new Promise((resolve) => setTimeout(resolve, 1000));
-        const response = await api.get(`/books/${id}`);
+        // Book, favourite flag and note in one request (also records the open)
+        const response = await api.get(`/books/${id}/view`);
         setBook(response.data.book_detail);
+        setView({
+          isFavourite: response.data.is_favourite,
+          note: response.data.note ?? "",
+        });
       } catch (err) {
         setError("Failed to fetch book");
       } finally {
@@ -69,7 +75,7 @@ export default function BookDetailPage() {
         py: "2rem",
       }}
     >
-      <BookDetail book={book} />
+      <BookDetail book={book} view={view} />
     </Box>
   );
 }
@@ -14,6 +14,8 @@ import ErrorSnackbar from "@/components/ErrorSnackbar";
 
 export default function Home() {
   const [books, setBooks] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [recents, setRecents] = useState([]);
   const [loading, setLoading] = useState(true);
   const [scanLoading, setScanLoading] = useState(false);
@@ -30,6 +32,7 @@ export default function Home() {
   const fetchBooks = async (title = "") => {
     setLoading(true);
     setError(null);
+    setNextCursor(null);
 
     try {
       await new Promise((resolve) => setTimeout(resolve, 1000)); // delay
@@ -38,9 +41,10 @@ export default function Home() {
         const res = await api.get(
           // `/books/search?title=${encodeURIComponent(title)}`
           "/books/search",
-          { params: { title } }
+          { params: { q: title } }
         );
         setBooks(res.data.books || []);
+        setNextCursor(res.data.next_cursor || null);
       } else {
         // Fetch both books & recents on initial load
         const [booksRes, recentsRes] = await Promise.allSettled([
@@ -60,6 +64,7 @@ export default function Home() {
           // Books (required)
           if (booksRes.status === "fulfilled") {
             setBooks(booksRes.value.data.books || []);
+            setNextCursor(booksRes.value.data.next_cursor || null);
           } else {
             setError("Failed to fetch books.");
             setBooks([]); // clears book list on error
@@ -81,6 +86,32 @@ export default function Home() {
     }
   };
 
+  // Next page of the current list (search results or all books)
+  const loadMoreBooks = useCallback(async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+
+    try {
+      const params = searchTerm
+        ? { q: searchTerm, cursor: nextCursor }
+        : { cursor: nextCursor };
+      const res = await api.get("/books/search", { params });
+      setBooks((current) => {
+        const seen = new Set(current.map((book) => book.id));
+        return [
+          ...current,
+          ...(res.data.books || []).filter((book) => !seen.has(book.id)),
+        ];
+      });
+      setNextCursor(res.data.next_cursor || null);
+    } catch (err) {
+      console.error(err);
+      setNextCursor(null); // stop paging; a refresh or new search starts over
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [nextCursor, loadingMore, searchTerm]);
+
   // Fetch all books on mount
   useEffect(() => {
     fetchBooks(""); // empty search to get all
@@ -177,6 +208,9 @@ export default function Home() {
         onAction={() => {
           if (!scanLoading) handleScanBooks();
         }}
+        hasMore={Boolean(nextCursor)}
+        loadingMore={loadingMore}
+        onLoadMore={loadMoreBooks}
       />
     </Box>
   );
@@ -1,5 +1,6 @@
 // components/BookCardList.js
-import { Box, Typography } from "@mui/material";
+import { useEffect, useRef } from "react";
+import { Box, CircularProgress, Typography } from "@mui/material";
 
 import BookCard from "@/components/BookCardList/BookCard";
 import BookCardSkeleton from "@/components/BookCardList/BookCardSkeleton";
@@ -9,8 +10,27 @@ export default function BookCardList({
   section,
   loading,
   onAction,
+  hasMore = false,
+  loadingMore = false,
+  onLoadMore,
 }) {
   const skeletonCount = 5;
+  const rowRef = useRef(null);
+  const sentinelRef = useRef(null);
+
+  // Infinite scroll: ask for the next page once the end of the row is in view
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !hasMore || loading || loadingMore) return;
+    const observer = new IntersectionObserver(
+      (entries) => {
+        if (entries[0].isIntersecting) onLoadMore?.();
+      },
+      { root: rowRef.current, rootMargin: "0px 400px 0px 0px" }
+    );
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [hasMore, loading, loadingMore, onLoadMore, book_list]);
 
   return (
     <Box>
@@ -31,6 +51,7 @@ export default function BookCardList({
       </Box>
 
       <Box
+        ref={rowRef}
         sx={{
           display: "flex",
           overflowX: "auto",
@@ -45,6 +66,29 @@ export default function BookCardList({
               <BookCardSkeleton key={index} />
             ))
           : book_list.map((book) => <BookCard key={book.id} book={book} />)}
+        {!loading && hasMore && (
+          <Box
+            ref={sentinelRef}
+            sx={{
+              display: "flex",
+              alignItems: "center",
+              justifyContent: "center",
+              minWidth: "4rem",
+            }}
+          >
+            {loadingMore ? (
+              <CircularProgress size={24} />
+            ) : (
+              <Typography
+                component="span"
+                sx={{ cursor: "pointer", color: "primary.main" }}
+                onClick={() => onLoadMore?.()}
+              >
+                More
+              </Typography>
+            )}
+          </Box>
+        )}
       </Box>
     </Box>
   );
@@ -1,11 +1,23 @@
 import api from "./axios";
 
+const SCAN_POLL_INTERVAL_MS = 2000;
+
 export const scanBooks = async (folder) => {
-  const url = folder
-    ? `/scan?folder=${encodeURIComponent(folder)}`
-    : "/books/scan";
-  const response = await api.get(url);
-  return response.data.message;
+  const params = folder ? { folder } : {};
+  const response = await api.post("/books/scan/jobs", null, { params });
+  let job = response.data.job;
+
+  // Scans run in the background; poll until the job finishes
+  while (job.status === "running") {
+    await new Promise((resolve) => setTimeout(resolve, SCAN_POLL_INTERVAL_MS));
+    const res = await api.get(`/books/scan/jobs/${job.job_id}`);
+    job = res.data.job;
+  }
+
+  if (job.status !== "completed") {
+    throw new Error(job.error || "Scan failed");
+  }
+  return `Scanned ${job.result.added} new books`;
 };
 
 export const clearAllRecents = async () => {